@@ -0,0 +1,270 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import db, async_db
+
+KINDS = ("price", "percent", "volume", "gas")
+
+# Column positions in Database.get_all_active_alerts rows.
+_ID, _SLUG, _TARGET, _TYPE, _RECURRING, _LAST_PRICE, _TRIGGERED_AT, _BASIS = 0, 2, 3, 4, 5, 6, 7, 8
+
+PriceKey = Tuple[str, str]  # (collection_slug, price_basis)
+
+
+class _ThresholdList:
+    """Alerts of one kind kept as parallel arrays sorted by target price."""
+
+    __slots__ = ("targets", "alerts")
+
+    def __init__(self, alerts: List[Tuple]):
+        self.alerts = sorted(alerts, key=lambda alert: alert[_TARGET])
+        self.targets = [alert[_TARGET] for alert in self.alerts]
+
+
+class _PriceBook:
+    """Price alerts on one (slug, basis), split for bisection.
+
+    Armed alerts (one-shot, or recurring but never fired) fire whenever the
+    price is past their target. Latched alerts (recurring, already fired)
+    fire only when the price crosses their target between two checks.
+    """
+
+    __slots__ = ("alerts", "armed_below", "armed_above", "latched_below", "latched_above")
+
+    def __init__(self, alerts: List[Tuple]):
+        self.alerts = alerts
+        groups = {(armed, kind): [] for armed in (True, False) for kind in ("below", "above")}
+        for alert in alerts:
+            if alert[_TYPE] in ("below", "above"):
+                armed = not alert[_RECURRING] or not alert[_TRIGGERED_AT]
+                groups[(armed, alert[_TYPE])].append(alert)
+        self.armed_below = _ThresholdList(groups[(True, "below")])
+        self.armed_above = _ThresholdList(groups[(True, "above")])
+        self.latched_below = _ThresholdList(groups[(False, "below")])
+        self.latched_above = _ThresholdList(groups[(False, "above")])
+
+    def firing(self, previous: Optional[float], price: float) -> List[Tuple]:
+        """Alerts that fire when the price moves from ``previous`` to ``price``."""
+        below, above = self.armed_below, self.armed_above
+        fired = below.alerts[bisect_right(below.targets, price):]        # price < target
+        fired += above.alerts[:bisect_left(above.targets, price)]        # price > target
+
+        below, above = self.latched_below, self.latched_above
+        if previous is None:
+            # No stored observation yet: fall back to each alert's own last price.
+            fired += [alert for alert in below.alerts
+                      if price < alert[_TARGET] and _crossed(alert[_LAST_PRICE], alert[_TARGET], "below")]
+            fired += [alert for alert in above.alerts
+                      if price > alert[_TARGET] and _crossed(alert[_LAST_PRICE], alert[_TARGET], "above")]
+        elif previous <= 0:
+            fired += below.alerts[bisect_right(below.targets, price):]
+            fired += above.alerts[:bisect_left(above.targets, price)]
+        else:
+            # below: price < target <= previous; above: previous <= target < price
+            fired += below.alerts[bisect_right(below.targets, price):bisect_right(below.targets, previous)]
+            fired += above.alerts[bisect_left(above.targets, previous):bisect_left(above.targets, price)]
+        return fired
+
+
+def _crossed(last_price: Optional[float], target: float, alert_type: str) -> bool:
+    if last_price is None or last_price <= 0:
+        return True
+    return last_price >= target if alert_type == "below" else last_price <= target
+
+
+class AlertIndex:
+    """In-memory index of every active alert, grouped by collection.
+
+    Loaded once at startup and kept in sync through Database change
+    listeners: a change only marks its collection dirty, and the next
+    ``sync()`` reloads just those collections. Price alerts are grouped per
+    (slug, basis) into sorted threshold books, and the last observed price of
+    each key is kept (and persisted), so a tick only evaluates keys whose
+    price moved or whose alerts changed, and bisection yields exactly the
+    alerts that fire.
+    """
+
+    def __init__(self):
+        self._price: Dict[PriceKey, _PriceBook] = {}
+        self._percent: Dict[str, List[Tuple]] = {}
+        self._volume: Dict[str, List[Tuple]] = {}
+        self._gas: List[Tuple] = []
+        self._price_key_by_id: Dict[int, PriceKey] = {}
+        self._observed: Dict[PriceKey, float] = {}
+        self._stale: set = set()  # keys to evaluate even if their price did not move
+        self._observations_loaded = False
+
+        # Written from database worker threads, drained on the event loop.
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, set] = {kind: set() for kind in KINDS}
+        self._reload_all = set(KINDS)
+        self._stats = {"full_reloads": 0, "slug_reloads": 0}
+
+    # ---- Sync ----
+
+    def on_change(self, kind: str, collection_slug: Optional[str]):
+        """Database change listener."""
+        with self._lock:
+            if collection_slug is None:
+                self._reload_all.add(kind)
+            else:
+                self._dirty[kind].add(collection_slug)
+
+    async def sync(self):
+        """Reload whatever changed since the last sync (everything on the first call)."""
+        with self._lock:
+            reload_all, self._reload_all = self._reload_all, set()
+            dirty, self._dirty = self._dirty, {kind: set() for kind in KINDS}
+
+        if not self._observations_loaded:
+            self._observed = await async_db.get_price_alert_observations()
+            self._observations_loaded = True
+
+        for kind in KINDS:
+            if kind in reload_all:
+                self._stats["full_reloads"] += 1
+                if kind == "gas":
+                    self._gas = await async_db.get_all_gas_alerts()
+                else:
+                    self._replace(kind, None, await self._load(kind, None))
+            elif dirty[kind] and kind != "gas":
+                slugs = sorted(dirty[kind])
+                self._stats["slug_reloads"] += len(slugs)
+                self._replace(kind, slugs, await self._load(kind, slugs))
+
+    @staticmethod
+    async def _load(kind: str, slugs: Optional[List[str]]) -> List[Tuple]:
+        if kind == "price":
+            return await async_db.get_all_active_alerts(slugs)
+        if kind == "percent":
+            return await async_db.get_all_percentage_alerts(slugs)
+        return await async_db.get_all_volume_alerts(slugs)
+
+    def _replace(self, kind: str, slugs: Optional[List[str]], rows: List[Tuple]):
+        """Swap in freshly loaded rows for ``slugs`` (all collections if None)."""
+        if kind == "price":
+            if slugs is None:
+                stale = list(self._price)
+            else:
+                wanted = set(slugs)
+                stale = [key for key in self._price if key[0] in wanted]
+            for key in stale:
+                for alert in self._price.pop(key).alerts:
+                    self._price_key_by_id.pop(alert[_ID], None)
+            grouped: Dict[PriceKey, List[Tuple]] = {}
+            for alert in rows:
+                key = (alert[_SLUG], alert[_BASIS])
+                grouped.setdefault(key, []).append(alert)
+                self._price_key_by_id[alert[_ID]] = key
+            for key, alerts in grouped.items():
+                self._price[key] = _PriceBook(alerts)
+            self._stale.update(grouped)
+            return
+
+        groups = self._percent if kind == "percent" else self._volume
+        if slugs is None:
+            groups.clear()
+        else:
+            for slug in slugs:
+                groups.pop(slug, None)
+        for alert in rows:
+            groups.setdefault(alert[1], []).append(alert)
+
+    # ---- Queries ----
+
+    def price_keys(self) -> List[PriceKey]:
+        return list(self._price)
+
+    def price_alerts(self, key: PriceKey) -> List[Tuple]:
+        """Alerts on one (slug, basis)."""
+        book = self._price.get(key)
+        return book.alerts if book else []
+
+    def changed_price_keys(self, snapshot) -> List[PriceKey]:
+        """Keys with a price in ``snapshot`` that moved (or whose alerts changed) since last observed."""
+        changed = []
+        for key in self._price:
+            data = snapshot.price(*key)
+            if data and (key in self._stale or self._observed.get(key) != data[0]):
+                changed.append(key)
+        return changed
+
+    def percent_alerts(self) -> List[Tuple]:
+        return [alert for alerts in self._percent.values() for alert in alerts]
+
+    def volume_alerts(self) -> List[Tuple]:
+        return [alert for alerts in self._volume.values() for alert in alerts]
+
+    def gas_alerts(self) -> List[Tuple]:
+        return list(self._gas)
+
+    def percent_slugs(self) -> List[str]:
+        return list(self._percent)
+
+    def volume_slugs(self) -> List[str]:
+        return list(self._volume)
+
+    # ---- Updates from the alert cycle ----
+
+    def observe(self, key: PriceKey, price: float) -> Tuple[List[Tuple], Optional[float]]:
+        """Record ``price`` for ``key`` and return (alerts that fire, previous price)."""
+        previous = self._observed.get(key)
+        book = self._price.get(key)
+        self._observed[key] = price
+        self._stale.discard(key)
+        if book is None:
+            return [], previous
+        return book.firing(previous, price), previous
+
+    def restore(self, key: PriceKey, previous: Optional[float]):
+        """Undo ``observe`` after the cycle's writes failed, so the key is evaluated again."""
+        if previous is None:
+            self._observed.pop(key, None)
+        else:
+            self._observed[key] = previous
+        self._stale.add(key)
+
+    def apply_triggered(self, triggered: List[Tuple[int, float]]):
+        """Mirror the trigger half of Database.apply_price_alert_updates in memory."""
+        by_key: Dict[PriceKey, Dict[int, float]] = {}
+        for alert_id, price in triggered:
+            key = self._price_key_by_id.get(alert_id)
+            if key is not None:
+                by_key.setdefault(key, {})[alert_id] = price
+
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        for key, prices in by_key.items():
+            kept = []
+            for alert in self._price[key].alerts:
+                price = prices.get(alert[_ID])
+                if price is None:
+                    kept.append(alert)
+                    continue
+                if not alert[_RECURRING]:
+                    self._price_key_by_id.pop(alert[_ID], None)
+                    continue
+                alert = list(alert)
+                alert[_LAST_PRICE] = price
+                alert[_TRIGGERED_AT] = now
+                kept.append(tuple(alert))
+            if kept:
+                self._price[key] = _PriceBook(kept)
+            else:
+                del self._price[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "price_keys": len(self._price),
+            "price_alerts": len(self._price_key_by_id),
+            "percent_alerts": sum(len(alerts) for alerts in self._percent.values()),
+            "volume_alerts": sum(len(alerts) for alerts in self._volume.values()),
+            "gas_alerts": len(self._gas),
+            **self._stats,
+        }
+
+
+# Singleton instance, fed by every alert write made through ``db``
+alert_index = AlertIndex()
+db.add_change_listener(alert_index.on_change)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import math
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional, like the history store it reads from
+    np = None
+
+from config import ANALYTICS_WINDOW_HOURS, ANALYTICS_EWMA_SPAN_HOURS, PRICE_HISTORY_INTERVAL
+from history_store import history_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CollectionStats:
+    """Price history analytics for one collection over the analytics window.
+
+    Ratios are fractions (0.05 = 5%); None when there is not enough history.
+    """
+    slug: str
+    samples: int
+    floor: Optional[float]
+    change_24h: Optional[float]
+    mean_24h: Optional[float]
+    mean_window: Optional[float]
+    ewma: Optional[float]
+    volatility: Optional[float]      # daily realized volatility of floor log returns
+    drawdown: Optional[float]        # current floor vs. the window high (<= 0)
+    max_drawdown: Optional[float]    # deepest peak-to-trough fall in the window (<= 0)
+    volume: Optional[float]          # latest 24h volume sample
+    volume_zscore: Optional[float]   # latest volume vs. the rest of the window
+    computed_at: float
+
+
+def _value(x: float) -> Optional[float]:
+    return None if math.isnan(x) or math.isinf(x) else x
+
+
+def _ffill(matrix):
+    """Carry each row's last sample forward over gaps (leading gaps stay NaN)."""
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return matrix[np.arange(matrix.shape[0])[:, None], index]
+
+
+class Analytics:
+    """Vectorized analytics over the columnar price history.
+
+    Every collection's window is laid onto one (collections x samples) grid
+    of sample-interval buckets, so rolling means, EWMA, volatility,
+    drawdowns and volume z-scores are a handful of NumPy operations over the
+    whole matrix instead of per-collection Python loops. ``refresh()`` runs
+    after each history sweep and /stats reads the results.
+    """
+
+    def __init__(self, window_hours: int, ewma_span_hours: float, step_seconds: int):
+        self.step = step_seconds
+        self.steps = max(2, int(window_hours * 3600 // step_seconds))
+        self.ewma_alpha = 2.0 / (ewma_span_hours * 3600 / step_seconds + 1)
+        self._latest: Dict[str, CollectionStats] = {}
+        self._stats = {"runs": 0, "collections": 0, "last_run_ms": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and history_store.enabled
+
+    def compute(self, slugs: List[str], now: Optional[float] = None) -> Dict[str, CollectionStats]:
+        """Analytics for ``slugs`` from the history store (blocking)."""
+        if not self.enabled or not slugs:
+            return {}
+        now = time.time() if now is None else now
+        start = now - self.steps * self.step
+        floor = np.full((len(slugs), self.steps), np.nan)
+        volume = np.full((len(slugs), self.steps), np.nan)
+        history = history_store.read_recent(slugs, since=start, until=now)
+        for row, slug in enumerate(slugs):
+            columns = history.get(slug.lower())
+            if columns is None:
+                continue
+            bucket = ((columns["ts"] - start) // self.step).astype(np.int64)
+            keep = (bucket >= 0) & (bucket < self.steps)
+            floor[row, bucket[keep]] = columns["floor"][keep]
+            volume[row, bucket[keep]] = columns["volume"][keep]
+
+        per_day = max(1, int(round(86400 / self.step)))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)  # all-NaN rows
+            samples = np.count_nonzero(~np.isnan(floor), axis=1)
+            floor[floor <= 0] = np.nan
+            sampled = ~np.isnan(floor)
+            filled = _ffill(floor)
+            last = filled[:, -1]
+            change_24h = last / filled[:, -1 - per_day] - 1 if self.steps > per_day else np.full(len(slugs), np.nan)
+            mean_24h = np.nanmean(filled[:, -per_day:], axis=1)
+            mean_window = np.nanmean(filled, axis=1)
+
+            ewma = filled[:, 0].copy()
+            for column in range(1, self.steps):
+                x = filled[:, column]
+                ewma = np.where(np.isnan(ewma), x, self.ewma_alpha * x + (1 - self.ewma_alpha) * ewma)
+
+            # Returns between real samples only; a gap's move lands on the sample after it.
+            returns = np.diff(np.log(filled), axis=1)
+            returns[~sampled[:, 1:]] = np.nan
+            volatility = np.nanstd(returns, axis=1, ddof=1) * math.sqrt(per_day)
+
+            peak = np.fmax.accumulate(filled, axis=1)
+            drawdowns = filled / peak - 1
+            drawdown = drawdowns[:, -1]
+            max_drawdown = np.nanmin(drawdowns, axis=1)
+
+            # Latest volume sample against the other samples in the window.
+            valid = ~np.isnan(volume)
+            last_index = np.where(valid, np.arange(self.steps), -1).max(axis=1)
+            rows = np.arange(len(slugs))
+            latest_volume = np.where(last_index >= 0, volume[rows, np.maximum(last_index, 0)], np.nan)
+            baseline = volume.copy()
+            baseline[rows[last_index >= 0], last_index[last_index >= 0]] = np.nan
+            spread = np.nanstd(baseline, axis=1)
+            volume_zscore = np.where(spread > 0, (latest_volume - np.nanmean(baseline, axis=1)) / spread, np.nan)
+
+        metrics = {
+            name: [_value(x) for x in values.tolist()]
+            for name, values in (
+                ("floor", last), ("change_24h", change_24h), ("mean_24h", mean_24h),
+                ("mean_window", mean_window), ("ewma", ewma), ("volatility", volatility),
+                ("drawdown", drawdown), ("max_drawdown", max_drawdown),
+                ("volume", latest_volume), ("volume_zscore", volume_zscore),
+            )
+        }
+        return {
+            slug: CollectionStats(
+                slug=slug,
+                samples=int(samples[i]),
+                computed_at=now,
+                **{name: values[i] for name, values in metrics.items()},
+            )
+            for i, slug in enumerate(slugs)
+            if samples[i]
+        }
+
+    async def refresh(self, slugs: List[str]) -> int:
+        """Recompute analytics for ``slugs`` (the monitored collections of a sweep).
+
+        Results for collections no longer in ``slugs`` are dropped.
+        """
+        if not self.enabled:
+            return 0
+        started = time.monotonic()
+        results = await asyncio.to_thread(self.compute, list(dict.fromkeys(slug.lower() for slug in slugs)))
+        self._latest = results
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self._stats["runs"] += 1
+        self._stats["collections"] = len(self._latest)
+        self._stats["last_run_ms"] = round(elapsed_ms, 1)
+        logger.info(f"Analytics refresh: {len(results)} collections in {elapsed_ms:.0f} ms")
+        return len(results)
+
+    def get(self, slug: str) -> Optional[CollectionStats]:
+        """Latest computed analytics for ``slug``, if any."""
+        return self._latest.get(slug.lower())
+
+    async def get_fresh(self, slug: str) -> Optional[CollectionStats]:
+        """Analytics for ``slug``, computing them now if missing or older than one sample interval."""
+        if not self.enabled:
+            return None
+        slug = slug.lower()
+        cached = self._latest.get(slug)
+        if cached is not None and time.time() - cached.computed_at < self.step:
+            return cached
+        results = await asyncio.to_thread(self.compute, [slug])
+        self._latest.update(results)
+        return results.get(slug)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self._stats}
+
+
+# Singleton instance, refreshed after every price history sweep
+analytics = Analytics(
+    window_hours=ANALYTICS_WINDOW_HOURS,
+    ewma_span_hours=ANALYTICS_EWMA_SPAN_HOURS,
+    step_seconds=PRICE_HISTORY_INTERVAL,
+)
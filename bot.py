@@ -1,9 +1,12 @@
 import asyncio
+import functools
+import json
 import logging
 import os
 import re
 import threading
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
 from telegram.ext import (
@@ -14,22 +17,66 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
-from telegram.constants import ParseMode
+from telegram.constants import ChatAction, ParseMode
+from telegram.error import BadRequest
 
 from config import (
     TELEGRAM_BOT_TOKEN,
     ALERT_CHECK_INTERVAL,
     PRICE_HISTORY_INTERVAL,
+    PRICE_HISTORY_RETENTION_DAYS,
+    HISTORY_PRUNE_BATCH_SIZE,
+    HISTORY_PRUNE_MAX_BATCHES,
+    OUTBOX_DRAIN_INTERVAL,
+    ANALYTICS_WINDOW_HOURS,
     VOLUME_ALERT_COOLDOWN_SECONDS,
     VOLUME_SPIKE_MULTIPLIER,
+    VOLUME_SPIKE_MIN_ZSCORE,
+    VOLUME_BASELINE_MIN_SAMPLES,
 )
 from opensea_api import opensea_api
 from gas_api import gas_api
 from price_api import price_api
-from database import db
+from database import db, async_db
+from market import MarketSnapshot, take_history_snapshot, take_snapshot
+from alert_index import alert_index
+from notifier import notifier
+from outbox import outbox
+from history_store import history_store, to_epoch, to_recorded_at
+from analytics import analytics
+from charts import CHART_RANGES, charts
+import cache
+import http_client
+import rate_limiter
+from rate_limiter import Priority, request_priority
+
+
+def collect_metrics() -> dict:
+    """Runtime stats exposed on the health server's /metrics endpoint."""
+    return {
+        "upstreams": http_client.all_stats(),
+        "rate_limits": rate_limiter.all_stats(),
+        "caches": cache.all_stats(),
+        "database_pool": db.pool_stats(),
+        "alert_index": alert_index.stats(),
+        "notifier": notifier.stats(),
+        "outbox": outbox.stats(),
+        "history_store": history_store.stats(),
+        "analytics": analytics.stats(),
+        "charts": charts.stats(),
+    }
 
 
 class HealthCheckHandler(BaseHTTPRequestHandler):
+    def _send_metrics(self):
+        content = json.dumps(collect_metrics()).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(content)
+
     def _send_ok(self, method):
         content = b'OK - NFT Floor Price Bot is running'
         self.send_response(200)
@@ -41,6 +88,9 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
             self.wfile.write(content)
 
     def do_GET(self):
+        if self.path.split('?', 1)[0] == '/metrics':
+            self._send_metrics()
+            return
         self._send_ok('GET')
 
     def do_HEAD(self):
@@ -86,24 +136,6 @@ def _is_in_cooldown(last_triggered_at: str | None, cooldown_seconds: int) -> boo
     return datetime.utcnow() - last_triggered < timedelta(seconds=cooldown_seconds)
 
 
-def _price_alert_condition_met(alert_type: str, current_price: float, target_price: float) -> bool:
-    if alert_type == "below":
-        return current_price < target_price
-    if alert_type == "above":
-        return current_price > target_price
-    return False
-
-
-def _price_alert_crossed(alert_type: str, last_price: float | None, target_price: float) -> bool:
-    if last_price is None or last_price <= 0:
-        return True
-    if alert_type == "below":
-        return last_price >= target_price
-    if alert_type == "above":
-        return last_price <= target_price
-    return False
-
-
 def _normalize_basis(value: str | None) -> str:
     """Map a user/keyword value to the stored basis: 'floor' or 'top_offer'."""
     if value and value.lower() in ("offer", "top_offer", "topoffer", "top-offer", "bid"):
@@ -419,6 +451,35 @@ def _format_mint_added(nft_name: str, mint_price: str, date_str: str, mint_link:
     return "\n".join(lines)
 
 
+def _format_collection_stats(stats, window_days: int) -> str:
+    def pct(value):
+        return "-" if value is None else f"{value * 100:+.2f}%"
+
+    def price(value):
+        return "-" if value is None else f"{value:.4f}"
+
+    zscore = "-" if stats.volume_zscore is None else f"{stats.volume_zscore:+.2f}"
+    volatility = "-" if stats.volatility is None else f"{stats.volatility * 100:.2f}%"
+    return (
+        f"📊 *Statistik* `{stats.slug}`\n"
+        f"Riwayat {window_days} hari terakhir\n\n"
+        "💰 *Floor*\n"
+        f"Sekarang: *{price(stats.floor)}*\n"
+        f"Perubahan 24h: {pct(stats.change_24h)}\n"
+        f"Rata-rata 24h: {price(stats.mean_24h)}\n"
+        f"Rata-rata {window_days} hari: {price(stats.mean_window)}\n"
+        f"EWMA: {price(stats.ewma)}\n\n"
+        "📉 *Risiko*\n"
+        f"Volatilitas harian: {volatility}\n"
+        f"Drawdown: {pct(stats.drawdown)}\n"
+        f"Drawdown terdalam: {pct(stats.max_drawdown)}\n\n"
+        "📢 *Volume*\n"
+        f"Volume 24h: {price(stats.volume)}\n"
+        f"Z-score: {zscore}\n\n"
+        f"_{stats.samples} sampel riwayat harga_"
+    )
+
+
 # ============== Inline Keyboard Menus ==============
 
 def main_menu_keyboard():
@@ -507,12 +568,12 @@ def alerts_overview_keyboard(price_alerts, percent_alerts, volume_alerts, gas_al
     return InlineKeyboardMarkup(rows)
 
 
-def _alerts_overview_payload(user_id: int):
+async def _alerts_overview_payload(user_id: int):
     """Build (text, keyboard) for the alert list — shared by view + delete flows."""
-    price_alerts = db.get_user_alerts(user_id)
-    percent_alerts = db.get_percentage_alerts(user_id)
-    volume_alerts = db.get_volume_alerts(user_id)
-    gas_alerts = db.get_gas_alerts(user_id)
+    price_alerts = await async_db.get_user_alerts(user_id)
+    percent_alerts = await async_db.get_percentage_alerts(user_id)
+    volume_alerts = await async_db.get_volume_alerts(user_id)
+    gas_alerts = await async_db.get_gas_alerts(user_id)
     text = _format_alerts_overview(price_alerts, percent_alerts, volume_alerts, gas_alerts)
     if price_alerts or percent_alerts or volume_alerts or gas_alerts:
         keyboard = alerts_overview_keyboard(price_alerts, percent_alerts, volume_alerts, gas_alerts)
@@ -769,10 +830,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # ---- 1-tap alert delete ----
     if data.startswith("del_"):
         remove_map = {
-            "price": db.remove_alert_by_id,
-            "percent": db.remove_percent_alert_by_id,
-            "volume": db.remove_volume_alert_by_id,
-            "gas": db.remove_gas_alert_by_id,
+            "price": async_db.remove_alert_by_id,
+            "percent": async_db.remove_percent_alert_by_id,
+            "volume": async_db.remove_volume_alert_by_id,
+            "gas": async_db.remove_gas_alert_by_id,
         }
         try:
             _, kind, aid_str = data.split("_", 2)
@@ -781,14 +842,14 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             kind, aid = None, None
         remove_func = remove_map.get(kind)
         if remove_func and aid is not None:
-            remove_func(user_id, aid)
-        text, keyboard = _alerts_overview_payload(user_id)
+            await remove_func(user_id, aid)
+        text, keyboard = await _alerts_overview_payload(user_id)
         await show(text, keyboard)
         return
 
     # ---- No-arg commands: execute directly ----
     if data == "cmd_list":
-        collections = db.get_tracked_collections(user_id)
+        collections = await async_db.get_tracked_collections(user_id)
         text = _format_watchlist(collections)
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("📊 Cek Floor", callback_data="cmd_check"),
@@ -803,7 +864,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if data in ("cmd_check", "cmd_check_hi", "cmd_check_offer", "cmd_check_offer_hi"):
         mode = "offer" if "offer" in data else "floor"
         sort = "hi" if data.endswith("_hi") else "add"
-        if not db.get_tracked_collections(user_id):
+        if not await async_db.get_tracked_collections(user_id):
             keyboard = InlineKeyboardMarkup([
                 [InlineKeyboardButton("📌 Track", callback_data="cmd_track"),
                  InlineKeyboardButton("⬅️ Kembali", callback_data="menu_price")]
@@ -823,7 +884,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             row_id = int(id_str)
         except (ValueError, IndexError):
             action, row_id = None, -1
-        slug = db.get_tracked_slug_by_id(user_id, row_id) if row_id >= 0 else None
+        slug = await async_db.get_tracked_slug_by_id(user_id, row_id) if row_id >= 0 else None
         if slug is None:
             await show(
                 "⚠️ Koleksi tidak ditemukan (mungkin sudah di-untrack).",
@@ -850,9 +911,11 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
         if action == "wldetail":
             msg = await show(f"🔍 Mencari data untuk `{slug}`...")
-            text, kb = await _build_floor_overview(slug)
+            text, kb, refresh = await _build_floor_overview(slug)
             await msg.edit_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=kb,
                                 disable_web_page_preview=True)
+            if refresh is not None:
+                _spawn_background(_edit_when_refreshed(msg, slug, text, refresh))
             return
 
         if action in ("wlfloor", "wloffer"):
@@ -872,7 +935,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return
 
         if action == "wluntrack":
-            db.remove_tracked_collection(user_id, slug)
+            await async_db.remove_tracked_collection(user_id, slug)
             await show(
                 f"🗑 `{slug}` dihapus dari watchlist.",
                 InlineKeyboardMarkup([
@@ -884,12 +947,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return
 
     if data == "cmd_alerts":
-        text, keyboard = _alerts_overview_payload(user_id)
+        text, keyboard = await _alerts_overview_payload(user_id)
         await show(text, keyboard)
         return
 
     if data == "cmd_portfolio":
-        portfolio = db.get_portfolio(user_id)
+        portfolio = await async_db.get_portfolio(user_id)
         if not portfolio:
             text = _format_empty_state(
                 "💼 *Portfolio*",
@@ -940,7 +1003,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     if data == "cmd_mints":
-        reminders = db.get_mint_reminders(user_id)
+        reminders = await async_db.get_mint_reminders(user_id)
         text = _format_mint_reminders(reminders)
         if not reminders:
             keyboard = InlineKeyboardMarkup([
@@ -1006,7 +1069,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     if data.startswith("qa_track_"):
         slug = data[9:]  # extract slug from "qa_track_<slug>"
-        if db.add_tracked_collection(user_id, slug):
+        if await async_db.add_tracked_collection(user_id, slug):
             text = f"✅ `{slug}` berhasil ditambahkan ke watchlist!"
         else:
             text = f"ℹ️ `{slug}` sudah ada di watchlist Anda."
@@ -1079,7 +1142,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         if not slugs:
             await update.message.reply_text("❌ Ketik minimal satu slug.")
             return
-        msg = _batch_untrack(user_id, slugs)
+        msg = await _batch_untrack(user_id, slugs)
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("📋 Watchlist", callback_data="cmd_list"),
              InlineKeyboardButton("🏠 Menu", callback_data="menu_main")]
@@ -1097,7 +1160,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         if stats is None:
             await update.message.reply_text("❌ Gagal mengambil data. Silakan coba lagi.")
             return
-        previous_volume = db.get_average_volume(slug)
+        previous_volume = await async_db.get_average_volume(slug)
         message = opensea_api.format_volume_stats(
             stats, collection_info, previous_volume, collection_slug=slug
         )
@@ -1113,7 +1176,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         if not slugs:
             await update.message.reply_text("❌ Ketik minimal satu slug.")
             return
-        msg = _batch_remove_portfolio(user_id, slugs)
+        msg = await _batch_remove_portfolio(user_id, slugs)
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("💼 Lihat Portofolio", callback_data="cmd_portfolio"),
              InlineKeyboardButton("🏠 Menu", callback_data="menu_main")]
@@ -1175,9 +1238,9 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
             current_price = total.get("floor_price", 0) or 0
             symbol = total.get("floor_price_symbol", "ETH")
 
-        success = db.add_price_alert(user_id, slug, target_price, alert_type,
-                                      is_recurring=is_recurring, current_price=current_price,
-                                      price_basis=price_basis)
+        success = await async_db.add_price_alert(user_id, slug, target_price, alert_type,
+                                                 is_recurring=is_recurring, current_price=current_price,
+                                                 price_basis=price_basis)
         if success:
             msg = _format_price_alert_created(
                 slug, current_price, symbol, target_price, alert_type, is_recurring, price_basis
@@ -1224,8 +1287,8 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
             ref_price = total.get("floor_price", 0) or 0
             symbol = total.get("floor_price_symbol", "ETH")
 
-        success = db.add_percentage_alert(user_id, slug, percentage, direction,
-                                           is_recurring=is_recurring, reference_price=ref_price)
+        success = await async_db.add_percentage_alert(user_id, slug, percentage, direction,
+                                                      is_recurring=is_recurring, reference_price=ref_price)
         if success:
             msg = _format_percent_alert_created(
                 slug, ref_price, symbol, percentage, direction, is_recurring
@@ -1262,7 +1325,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         if stats and "error" in stats:
             await update.message.reply_text(f"❌ {stats['error']}")
             return
-        success = db.add_volume_alert(user_id, slug, multiplier)
+        success = await async_db.add_volume_alert(user_id, slug, multiplier)
         if success:
             msg = _format_volume_alert_created(slug, multiplier)
         else:
@@ -1293,11 +1356,11 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         type_map = {
-            "price": ("Price Alert", db.remove_alert_by_id),
-            "persen": ("% Alert", db.remove_percent_alert_by_id),
-            "percent": ("% Alert", db.remove_percent_alert_by_id),
-            "volume": ("Volume Alert", db.remove_volume_alert_by_id),
-            "gas": ("Gas Alert", db.remove_gas_alert_by_id),
+            "price": ("Price Alert", async_db.remove_alert_by_id),
+            "persen": ("% Alert", async_db.remove_percent_alert_by_id),
+            "percent": ("% Alert", async_db.remove_percent_alert_by_id),
+            "volume": ("Volume Alert", async_db.remove_volume_alert_by_id),
+            "gas": ("Gas Alert", async_db.remove_gas_alert_by_id),
         }
         if alert_type not in type_map:
             await update.message.reply_text(
@@ -1307,7 +1370,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         type_name, remove_func = type_map[alert_type]
-        success = remove_func(user_id, alert_id)
+        success = await remove_func(user_id, alert_id)
         if success:
             msg = f"✅ {type_name} `#{alert_id}` berhasil dihapus!"
         else:
@@ -1335,7 +1398,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         if stats and "error" in stats:
             await update.message.reply_text(f"❌ {stats['error']}")
             return
-        success = db.add_portfolio_item(user_id, slug, quantity, buy_price)
+        success = await async_db.add_portfolio_item(user_id, slug, quantity, buy_price)
         if success:
             msg = _format_portfolio_item_added(slug, quantity, buy_price)
         else:
@@ -1357,7 +1420,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         alert_type = parts[1].lower() if len(parts) > 1 else "below"
         if alert_type not in ["below", "above"]:
             alert_type = "below"
-        success = db.add_gas_alert(user_id, target_gwei, alert_type)
+        success = await async_db.add_gas_alert(user_id, target_gwei, alert_type)
         if success:
             msg = _format_gas_alert_created(target_gwei, alert_type)
         else:
@@ -1391,7 +1454,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
                 parse_mode=ParseMode.MARKDOWN
             )
             return
-        success = db.add_mint_reminder(user_id, nft_name, mint_price, date_str, mint_link)
+        success = await async_db.add_mint_reminder(user_id, nft_name, mint_price, date_str, mint_link)
         if success:
             msg = _format_mint_added(nft_name, mint_price, date_str, mint_link)
         else:
@@ -1410,7 +1473,7 @@ async def pending_input_handler(update: Update, context: ContextTypes.DEFAULT_TY
         except ValueError:
             await update.message.reply_text("❌ ID harus berupa angka. Cek ID di /mints")
             return
-        success = db.remove_mint_reminder(user_id, reminder_id)
+        success = await async_db.remove_mint_reminder(user_id, reminder_id)
         if success:
             msg = f"✅ Reminder #{reminder_id} berhasil dihapus."
         else:
@@ -1448,7 +1511,7 @@ async def dot_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             return
 
         key = parts[1].lower()
-        slug = db.get_slug_alias(user_id, key) or key
+        slug = await async_db.get_slug_alias(user_id, key) or key
         await send_floor_overview(update.message, slug)
         return
 
@@ -1476,7 +1539,7 @@ async def dot_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             await update.message.reply_text(f"❌ {stats['error']}")
             return
 
-        if db.set_slug_alias(user_id, alias, slug):
+        if await async_db.set_slug_alias(user_id, alias, slug):
             await update.message.reply_text(
                 f"✅ Alias disimpan: `.{alias}` → `{slug}`\n"
                 f"Pakai: `.p {alias}`",
@@ -1487,7 +1550,7 @@ async def dot_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     if command in (".aliases", ".aliaslist"):
-        aliases = db.get_slug_aliases(user_id)
+        aliases = await async_db.get_slug_aliases(user_id)
         if not aliases:
             await update.message.reply_text(
                 "📎 Belum ada alias.\nContoh buat: `.alias bonsai on-chain-bonsai`",
@@ -1511,7 +1574,7 @@ async def dot_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             return
 
         alias = parts[1].lower()
-        if db.remove_slug_alias(user_id, alias):
+        if await async_db.remove_slug_alias(user_id, alias):
             await update.message.reply_text(f"✅ Alias `{alias}` dihapus.", parse_mode=ParseMode.MARKDOWN)
         else:
             await update.message.reply_text(f"❌ Alias `{alias}` tidak ditemukan.", parse_mode=ParseMode.MARKDOWN)
@@ -1519,7 +1582,13 @@ async def dot_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 async def post_init(application: Application) -> None:
-    """Set bot commands for Telegram's built-in menu."""
+    """Open shared upstream sessions, start the notifier, load the alert index and set bot commands."""
+    await http_client.start_all()
+    notifier.start(application.bot)
+    await alert_index.sync()
+    if history_store.enabled:
+        _spawn_background(_catch_up_history_store())
+
     commands = [
         BotCommand("start", "🏠 Menu utama"),
         BotCommand("help", "📖 Bantuan"),
@@ -1531,6 +1600,8 @@ async def post_init(application: Application) -> None:
         BotCommand("alert", "⚡ Set price alert"),
         BotCommand("palert", "📈 Set % alert"),
         BotCommand("valert", "📢 Set volume alert"),
+        BotCommand("stats", "📈 Statistik riwayat harga"),
+        BotCommand("chart", "🖼 Grafik floor & volume"),
         BotCommand("alerts", "🔔 Lihat semua alert"),
         BotCommand("addnft", "➕ Tambah NFT"),
         BotCommand("removenft", "➖ Hapus NFT"),
@@ -1546,6 +1617,22 @@ async def post_init(application: Application) -> None:
     await application.bot.set_my_commands(commands)
 
 
+async def post_shutdown(application: Application) -> None:
+    """Flush queued notifications, then close shared upstream sessions and the database pool."""
+    await notifier.stop()
+    await outbox.flush()
+    if _history_sweep is not None and not _history_sweep.done():
+        # Stop a running history sweep before the sessions and database it uses go away.
+        _history_sweep.cancel()
+        try:
+            await _history_sweep
+        except asyncio.CancelledError:
+            pass
+    await http_client.close_all()
+    async_db.shutdown()
+    db.close()
+
+
 async def _fetch_stats_map(slugs: list[str]) -> dict:
     """Fetch collection stats for many slugs concurrently -> {slug: stats|None}."""
     unique = list(dict.fromkeys(slugs))  # de-dup, preserve order
@@ -1584,7 +1671,7 @@ async def _build_check(user_id: int, mode: str = "floor", sort: str = "add"):
     same order as the numbered list, so buttons (keyed by stable row_id) line up.
     Returns (None, []) when the watchlist is empty.
     """
-    items = db.get_tracked_with_ids(user_id)
+    items = await async_db.get_tracked_with_ids(user_id)
     if not items:
         return None, []
 
@@ -1708,7 +1795,7 @@ async def _batch_track(user_id: int, slugs: list[str]) -> str:
         stats = stats_map.get(slug)
         if not stats or "error" in stats:
             failed.append(slug)
-        elif db.add_tracked_collection(user_id, slug):
+        elif await async_db.add_tracked_collection(user_id, slug):
             added.append(slug)
         else:
             exists.append(slug)
@@ -1719,37 +1806,34 @@ async def _batch_track(user_id: int, slugs: list[str]) -> str:
     ])
 
 
-def _batch_untrack(user_id: int, slugs: list[str]) -> str:
+async def _batch_untrack(user_id: int, slugs: list[str]) -> str:
     """Untrack many collections at once (no API calls needed)."""
     removed, notfound = [], []
     for slug in slugs:
-        (removed if db.remove_tracked_collection(user_id, slug) else notfound).append(slug)
+        (removed if await async_db.remove_tracked_collection(user_id, slug) else notfound).append(slug)
     return _format_batch_summary("🗑 *Untrack*", [
         ("✅ Dihapus", removed),
         ("❌ Tidak ada di watchlist", notfound),
     ])
 
 
-def _batch_remove_portfolio(user_id: int, slugs: list[str]) -> str:
+async def _batch_remove_portfolio(user_id: int, slugs: list[str]) -> str:
     """Remove many portfolio holdings at once."""
     removed, notfound = [], []
     for slug in slugs:
-        (removed if db.remove_portfolio_item(user_id, slug) else notfound).append(slug)
+        (removed if await async_db.remove_portfolio_item(user_id, slug) else notfound).append(slug)
     return _format_batch_summary("➖ *Hapus NFT*", [
         ("✅ Dihapus", removed),
         ("❌ Tidak ada di portfolio", notfound),
     ])
 
 
-async def _build_floor_overview(slug: str):
-    """Fetch and format the rich floor/market overview. Returns (text, keyboard).
+def _format_floor_overview(slug: str, overview, eth_data):
+    """Format a (stats, info, sales) overview. Returns (text, keyboard).
 
     On failure, keyboard is None.
     """
-    overview_task = opensea_api.get_collection_overview(slug)
-    eth_task = price_api.get_eth_price()
-    (stats, collection_info, sales_data), eth_data = await asyncio.gather(overview_task, eth_task)
-
+    stats, collection_info, sales_data = overview
     if stats is None:
         return "❌ Gagal mengambil data. Silakan coba lagi.", None
     if isinstance(stats, dict) and "error" in stats:
@@ -1771,17 +1855,76 @@ async def _build_floor_overview(slug: str):
     return text, keyboard
 
 
+async def _build_floor_overview(slug: str):
+    """Fetch and format the rich floor/market overview. Returns (text, keyboard, refresh).
+
+    On failure, keyboard is None. ``refresh`` is a task for a background
+    revalidation when the overview came from the stale-while-revalidate cache
+    (pass it to _edit_when_refreshed), else None.
+    """
+    overview_task = opensea_api.get_collection_overview_swr(slug)
+    eth_task = price_api.get_eth_price()
+    (overview, refresh), eth_data = await asyncio.gather(overview_task, eth_task)
+    text, keyboard = _format_floor_overview(slug, overview, eth_data)
+    return text, keyboard, refresh
+
+
+_background_tasks: set = set()
+
+
+def _spawn_background(coro) -> None:
+    """Run a fire-and-forget coroutine, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _catch_up_history_store() -> None:
+    """Append history the columnar store missed (all of it on first start)."""
+    started = time.monotonic()
+    try:
+        recovered = await history_store.catch_up_async()
+    except Exception as e:
+        logger.error(f"History store catch-up failed: {e}")
+        return
+    if recovered:
+        logger.info(
+            f"History store catch-up: {recovered} samples in {(time.monotonic() - started) * 1000:.0f} ms"
+        )
+
+
+async def _edit_when_refreshed(message, slug: str, shown_text: str, refresh) -> None:
+    """Edit an overview served from cache in place once its refresh lands, if it changed."""
+    try:
+        overview = await refresh
+        eth_data = await price_api.get_eth_price()
+        text, keyboard = _format_floor_overview(slug, overview, eth_data)
+        if keyboard is None or text == shown_text:
+            return
+        await message.edit_text(
+            text,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=keyboard,
+            disable_web_page_preview=True,
+        )
+    except Exception as e:
+        logger.warning(f"Overview refresh for {slug} not applied: {e}")
+
+
 async def send_floor_overview(message, collection_slug: str) -> None:
     """Send the rich floor/market overview for a collection slug."""
     slug = collection_slug.lower().strip()
-    await message.reply_text(f"🔍 Mencari data untuk `{slug}`...", parse_mode=ParseMode.MARKDOWN)
-    text, keyboard = await _build_floor_overview(slug)
-    await message.reply_text(
+    if not opensea_api.has_cached_overview(slug):
+        await message.reply_text(f"🔍 Mencari data untuk `{slug}`...", parse_mode=ParseMode.MARKDOWN)
+    text, keyboard, refresh = await _build_floor_overview(slug)
+    sent = await message.reply_text(
         text,
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=keyboard,
         disable_web_page_preview=True,
     )
+    if refresh is not None:
+        _spawn_background(_edit_when_refreshed(sent, slug, text, refresh))
 
 
 async def floor_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -1834,7 +1977,7 @@ async def untrack_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     user_id = update.effective_user.id
-    text = _batch_untrack(user_id, slugs)
+    text = await _batch_untrack(user_id, slugs)
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("📋 Watchlist", callback_data="cmd_list"),
          InlineKeyboardButton("🏠 Menu", callback_data="menu_main")]
@@ -1845,7 +1988,7 @@ async def untrack_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List all tracked collections."""
     user_id = update.effective_user.id
-    collections = db.get_tracked_collections(user_id)
+    collections = await async_db.get_tracked_collections(user_id)
 
     await update.message.reply_text(_format_watchlist(collections), parse_mode=ParseMode.MARKDOWN)
 
@@ -1853,7 +1996,7 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Check prices for all tracked collections."""
     user_id = update.effective_user.id
-    collections = db.get_tracked_collections(user_id)
+    collections = await async_db.get_tracked_collections(user_id)
 
     if not collections:
         await update.message.reply_text(
@@ -1921,9 +2064,9 @@ async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         current_price = total.get("floor_price", 0) or 0
         symbol = total.get("floor_price_symbol", "ETH")
 
-    success = db.add_price_alert(user_id, collection_slug, target_price, alert_type,
-                                 is_recurring=is_recurring, current_price=current_price,
-                                 price_basis=price_basis)
+    success = await async_db.add_price_alert(user_id, collection_slug, target_price, alert_type,
+                                             is_recurring=is_recurring, current_price=current_price,
+                                             price_basis=price_basis)
 
     if success:
         await update.message.reply_text(
@@ -1945,7 +2088,7 @@ async def alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     """List all active alerts for user."""
     user_id = update.effective_user.id
 
-    text, keyboard = _alerts_overview_payload(user_id)
+    text, keyboard = await _alerts_overview_payload(user_id)
     await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
 
 
@@ -1969,11 +2112,11 @@ async def delalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     user_id = update.effective_user.id
     type_map = {
-        "price": ("Price Alert", db.remove_alert_by_id),
-        "persen": ("% Alert", db.remove_percent_alert_by_id),
-        "percent": ("% Alert", db.remove_percent_alert_by_id),
-        "volume": ("Volume Alert", db.remove_volume_alert_by_id),
-        "gas": ("Gas Alert", db.remove_gas_alert_by_id),
+        "price": ("Price Alert", async_db.remove_alert_by_id),
+        "persen": ("% Alert", async_db.remove_percent_alert_by_id),
+        "percent": ("% Alert", async_db.remove_percent_alert_by_id),
+        "volume": ("Volume Alert", async_db.remove_volume_alert_by_id),
+        "gas": ("Gas Alert", async_db.remove_gas_alert_by_id),
     }
 
     if alert_type not in type_map:
@@ -1984,7 +2127,7 @@ async def delalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return
 
     type_name, remove_func = type_map[alert_type]
-    success = remove_func(user_id, alert_id)
+    success = await remove_func(user_id, alert_id)
     if success:
         await update.message.reply_text(f"✅ {type_name} `#{alert_id}` berhasil dihapus!", parse_mode=ParseMode.MARKDOWN)
     else:
@@ -2036,8 +2179,8 @@ async def palert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         ref_price = total.get("floor_price", 0) or 0
         symbol = total.get("floor_price_symbol", "ETH")
 
-    success = db.add_percentage_alert(user_id, collection_slug, percentage, direction,
-                                      is_recurring=is_recurring, reference_price=ref_price)
+    success = await async_db.add_percentage_alert(user_id, collection_slug, percentage, direction,
+                                                  is_recurring=is_recurring, reference_price=ref_price)
 
     if success:
         await update.message.reply_text(
@@ -2076,7 +2219,7 @@ async def volume_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     # Get previous volume for comparison
-    previous_volume = db.get_average_volume(collection_slug)
+    previous_volume = await async_db.get_average_volume(collection_slug)
 
     message = opensea_api.format_volume_stats(
         stats, collection_info, previous_volume, collection_slug=collection_slug
@@ -2084,6 +2227,90 @@ async def volume_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
 
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show price history analytics for a collection."""
+    if not context.args:
+        await update.message.reply_text(
+            "❌ Format: `/stats <collection_slug>`\n"
+            "Contoh: `/stats boredapeyachtclub`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    if not analytics.enabled:
+        await update.message.reply_text("❌ Statistik riwayat harga belum tersedia di server ini.")
+        return
+
+    collection_slug = context.args[0].lower()
+    stats = await analytics.get_fresh(collection_slug)
+    if stats is None:
+        await update.message.reply_text(
+            f"ℹ️ Belum ada riwayat harga untuk `{collection_slug}`.\n"
+            "_Riwayat dicatat tiap jam untuk koleksi yang dipantau (watchlist, alert, portofolio)._",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    await update.message.reply_text(
+        _format_collection_stats(stats, ANALYTICS_WINDOW_HOURS // 24),
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+
+async def chart_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a floor/volume chart of a collection's price history."""
+    ranges = "|".join(CHART_RANGES)
+    if not context.args or (len(context.args) > 1 and context.args[1].lower() not in CHART_RANGES):
+        await update.message.reply_text(
+            f"❌ Format: `/chart <collection_slug> [{ranges}]`\n"
+            "Contoh: `/chart boredapeyachtclub 7d`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    if not charts.available:
+        await update.message.reply_text("❌ Grafik belum tersedia di server ini.")
+        return
+
+    collection_slug = context.args[0].lower()
+    range_key = context.args[1].lower() if len(context.args) > 1 else "24h"
+    await update.message.chat.send_action(ChatAction.UPLOAD_PHOTO)
+
+    for _attempt in range(2):
+        try:
+            chart = await charts.get(collection_slug, range_key)
+        except Exception as e:
+            logger.error(f"Chart for {collection_slug} ({range_key}) failed: {e}")
+            await update.message.reply_text("❌ Gagal membuat grafik, coba lagi nanti.")
+            return
+        if chart is None:
+            await update.message.reply_text(
+                f"ℹ️ Belum ada riwayat harga untuk `{collection_slug}`.\n"
+                "_Riwayat dicatat tiap jam untuk koleksi yang dipantau (watchlist, alert, portofolio)._",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+
+        change = (chart.last_floor / chart.first_floor - 1) * 100 if chart.first_floor else 0
+        caption = (
+            f"📈 `{collection_slug}` · {range_key}\n"
+            f"Floor: *{chart.last_floor:.4f}* ({change:+.2f}%)"
+        )
+        try:
+            message = await update.message.reply_photo(
+                photo=chart.file_id or chart.png, caption=caption, parse_mode=ParseMode.MARKDOWN
+            )
+        except BadRequest as e:
+            if not chart.file_id:
+                raise
+            logger.warning(f"Cached chart file_id rejected for {collection_slug}: {e}")
+            charts.forget(chart)
+            continue
+        if not chart.file_id and message.photo:
+            charts.remember(chart, message.photo[-1].file_id)
+        return
+
+
 async def valert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Set volume spike alert."""
     if not context.args:
@@ -2111,7 +2338,7 @@ async def valert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text(f"❌ {stats['error']}")
         return
 
-    success = db.add_volume_alert(user_id, collection_slug, multiplier)
+    success = await async_db.add_volume_alert(user_id, collection_slug, multiplier)
 
     if success:
         await update.message.reply_text(
@@ -2155,7 +2382,7 @@ async def addnft_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text(f"❌ {stats['error']}")
         return
 
-    success = db.add_portfolio_item(user_id, collection_slug, quantity, buy_price)
+    success = await async_db.add_portfolio_item(user_id, collection_slug, quantity, buy_price)
 
     if success:
         await update.message.reply_text(
@@ -2178,7 +2405,7 @@ async def removenft_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     user_id = update.effective_user.id
-    text = _batch_remove_portfolio(user_id, slugs)
+    text = await _batch_remove_portfolio(user_id, slugs)
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("💼 Portofolio", callback_data="cmd_portfolio"),
          InlineKeyboardButton("🏠 Menu", callback_data="menu_main")]
@@ -2189,7 +2416,7 @@ async def removenft_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def portfolio_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show user portfolio with P/L and ROI."""
     user_id = update.effective_user.id
-    portfolio = db.get_portfolio(user_id)
+    portfolio = await async_db.get_portfolio(user_id)
 
     if not portfolio:
         await update.message.reply_text(
@@ -2282,7 +2509,7 @@ async def gasalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         alert_type = "below"
 
     user_id = update.effective_user.id
-    success = db.add_gas_alert(user_id, target_gwei, alert_type)
+    success = await async_db.add_gas_alert(user_id, target_gwei, alert_type)
 
     if success:
         await update.message.reply_text(
@@ -2296,122 +2523,86 @@ async def gasalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         )
 
 
-async def _fetch_alert_price(slug: str, basis: str):
-    """Fetch (price, symbol) for one (slug, basis). Returns None on error/missing."""
-    try:
-        if basis == "top_offer":
-            offer = await opensea_api.get_top_collection_offer(slug)
-            if not offer or "error" in offer:
-                return None
-            return offer.get("value"), offer.get("symbol", "WETH")
-        stats = await opensea_api.get_collection_stats(slug)
-        if not stats or "error" in stats:
-            return None
-        total = stats.get("total", {})
-        floor = total.get("floor_price")
-        if floor is None:
-            return None
-        return floor, total.get("floor_price_symbol", "ETH")
-    except Exception as e:
-        logger.error(f"Alert price fetch failed for {slug}/{basis}: {e}")
-        return None
+def _upstream_priority(priority: Priority):
+    """Tag every upstream request a background job makes with ``priority``."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(context: ContextTypes.DEFAULT_TYPE) -> None:
+            with request_priority(priority):
+                await func(context)
+        return wrapper
+    return decorator
 
 
-async def _fetch_alert_prices(keys, concurrency: int = 10) -> dict:
-    """Fetch prices for many (slug, basis) keys concurrently (deduped, capped).
+async def check_alerts(context: ContextTypes.DEFAULT_TYPE, snapshot: MarketSnapshot, keys) -> None:
+    """Evaluate price alerts on the (slug, basis) keys whose price moved this tick.
 
-    Returns {(slug, basis): (price, symbol) | None}. This is what keeps the
-    background alert cycle fast — one fetch per unique collection, in parallel,
-    instead of one sequential request per alert.
+    The alert index bisects each key's sorted thresholds, so only alerts that
+    actually fire are touched.
     """
-    unique = list(dict.fromkeys(keys))
-    if not unique:
-        return {}
-    sem = asyncio.Semaphore(concurrency)
-
-    async def one(slug, basis):
-        async with sem:
-            return await _fetch_alert_price(slug, basis)
-
-    results = await asyncio.gather(*(one(slug, basis) for slug, basis in unique))
-    return dict(zip(unique, results))
-
-
-async def check_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Background job to check price alerts."""
-    alerts = db.get_all_active_alerts()
-    if not alerts:
-        return
-
-    # Fetch every distinct (collection, basis) once, in parallel.
-    price_map = await _fetch_alert_prices((a[1], a[7]) for a in alerts)
-
-    for (user_id, collection_slug, target_price, alert_type, is_recurring,
-         last_price, triggered_at, price_basis) in alerts:
-        try:
-            data = price_map.get((collection_slug, price_basis))
-            if not data:
-                continue
-            current_price, symbol = data
-            basis_label = "Top Offer" if price_basis == "top_offer" else "Floor Price"
-
-            condition_met = _price_alert_condition_met(alert_type, current_price, target_price)
-            crossed = _price_alert_crossed(alert_type, last_price, target_price)
-            should_trigger = condition_met and (not is_recurring or not triggered_at or crossed)
-
-            if should_trigger:
-                message = (
-                    f"🚨 *Alert Triggered!*\n\n"
-                    f"Koleksi: `{collection_slug}`\n"
-                    f"{basis_label}: *{current_price:.4f} {symbol}*\n"
-                    f"Target: {alert_type} {target_price} {symbol}"
-                )
+    if not keys:
+        return
+
+    # State changes are collected and written in one transaction at the end.
+    # Notifications go to the outbox in that same transaction.
+    observations, triggered, notifications, previous_prices = [], [], [], {}
+    cycle = int(snapshot.taken_at)
+    for key in keys:
+        collection_slug, price_basis = key
+        current_price, symbol = snapshot.price(collection_slug, price_basis)
+        basis_label = "Top Offer" if price_basis == "top_offer" else "Floor Price"
+        firing, previous = alert_index.observe(key, current_price)
+        previous_prices[key] = previous
+        if current_price != previous:
+            observations.append((collection_slug, price_basis, current_price))
+
+        for alert_id, user_id, _slug, target_price, alert_type, *_rest in firing:
+            message = (
+                f"🚨 *Alert Triggered!*\n\n"
+                f"Koleksi: `{collection_slug}`\n"
+                f"{basis_label}: *{current_price:.4f} {symbol}*\n"
+                f"Target: {alert_type} {target_price} {symbol}"
+            )
 
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=message,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    db.deactivate_alert(
-                        user_id,
-                        collection_slug,
-                        target_price,
-                        alert_type,
-                        current_price=current_price,
-                        price_basis=price_basis,
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to send alert to user {user_id}: {e}")
-            else:
-                db.update_price_alert_observed_price(
-                    user_id, collection_slug, target_price, alert_type, current_price,
-                    price_basis=price_basis
-                )
+            notifications.append((f"price:{alert_id}:{cycle}", user_id, message))
+            triggered.append((alert_id, current_price))
 
-        except Exception as e:
-            logger.error(f"Error checking alert for {collection_slug}: {e}")
+    started = time.monotonic()
+    try:
+        written = await async_db.apply_price_alert_updates(observations, triggered, notifications)
+    except Exception as e:
+        logger.error(f"Failed to write alert state ({len(observations) + len(triggered)} updates): {e}")
+        for key, previous in previous_prices.items():
+            alert_index.restore(key, previous)
+        return
+    alert_index.apply_triggered(triggered)
+    if written:
+        logger.info(
+            f"Alert state flush: {written} rows ({len(triggered)} triggered) "
+            f"in {(time.monotonic() - started) * 1000:.0f} ms"
+        )
 
 
-async def check_percentage_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Background job to check percentage-based alerts."""
-    alerts = db.get_all_percentage_alerts()
+async def check_percentage_alerts(context: ContextTypes.DEFAULT_TYPE, snapshot: MarketSnapshot,
+                                  alerts) -> None:
+    """Evaluate percentage-based alerts against the tick's market snapshot."""
     if not alerts:
         return
 
-    # Percentage alerts all track floor; fetch each collection's floor once.
-    price_map = await _fetch_alert_prices((a[1], "floor") for a in alerts)
+    # Alerts without a stored reference fall back to the oldest price of the
+    # last 24h; look those up for every collection at once.
+    oldest_prices = await async_db.get_oldest_prices([a[1] for a in alerts if not a[4]])
 
     for user_id, collection_slug, percentage, direction, reference_price, _is_recurring in alerts:
         try:
-            data = price_map.get((collection_slug, "floor"))
+            data = snapshot.floor(collection_slug)
             if not data:
                 continue
             current_price, symbol = data
 
-            ref_price = reference_price or db.get_oldest_price(collection_slug)
+            ref_price = reference_price or oldest_prices.get(collection_slug)
             if not ref_price or ref_price <= 0:
-                db.update_percentage_alert_ref_price(
+                await async_db.update_percentage_alert_ref_price(
                     user_id, collection_slug, percentage, direction, current_price
                 )
                 continue
@@ -2438,53 +2629,59 @@ async def check_percentage_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
                     f"Harga sekarang: *{current_price:.4f} {symbol}*"
                 )
 
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=message,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    db.deactivate_percentage_alert(
+                await async_db.deactivate_percentage_alert(
+                    user_id,
+                    collection_slug,
+                    percentage,
+                    direction,
+                    new_ref_price=current_price,
+                    notification=(
+                        f"percent:{user_id}:{collection_slug}:{percentage}:{direction}:{int(snapshot.taken_at)}",
                         user_id,
-                        collection_slug,
-                        percentage,
-                        direction,
-                        new_ref_price=current_price,
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to send percentage alert to user {user_id}: {e}")
+                        message,
+                    ),
+                )
 
         except Exception as e:
             logger.error(f"Error checking percentage alert for {collection_slug}: {e}")
 
 
-async def check_volume_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Background job to check volume spike alerts."""
-    alerts = db.get_all_volume_alerts()
+async def check_volume_alerts(context: ContextTypes.DEFAULT_TYPE, snapshot: MarketSnapshot,
+                              alerts) -> None:
+    """Evaluate volume spike alerts against the tick's market snapshot.
+
+    Each collection's volume is compared with its robust baseline (EWMA mean
+    and deviation, advanced on every history write), read for all alerted
+    collections in one lookup. A spike needs both the user's multiplier over
+    the baseline mean and, once the baseline is warm, a z-score of at least
+    VOLUME_SPIKE_MIN_ZSCORE, so ordinary noise in volatile collections no
+    longer fires alerts.
+    """
+    if not alerts:
+        return
+    baselines = await async_db.get_volume_baselines([a[1] for a in alerts])
 
     for user_id, collection_slug, multiplier, last_triggered_at in alerts:
         try:
-            stats = await opensea_api.get_collection_stats(collection_slug)
-            if stats and "error" not in stats:
-                # Get current volume from intervals
-                intervals = stats.get("intervals", [])
-                current_volume = 0
-
-                for interval in intervals:
-                    if interval.get("interval") == "one_day":
-                        current_volume = interval.get("volume", 0) or 0
-                        break
+            one_day = snapshot.one_day(collection_slug)
+            baseline = baselines.get(collection_slug)
+            if one_day is not None and baseline is not None:
+                current_volume = one_day.get("volume", 0) or 0
+                avg_volume, deviation, samples = baseline
 
-                # Get average volume
-                avg_volume = db.get_average_volume(collection_slug)
-
-                if avg_volume and avg_volume > 0 and current_volume > 0:
+                if avg_volume > 0 and current_volume > 0:
                     spike_ratio = current_volume / avg_volume
+                    zscore = (current_volume - avg_volume) / deviation if deviation > 0 else None
+                    unusual = (
+                        samples < VOLUME_BASELINE_MIN_SAMPLES
+                        or zscore is None
+                        or zscore >= VOLUME_SPIKE_MIN_ZSCORE
+                    )
 
-                    if spike_ratio >= multiplier and not _is_in_cooldown(
+                    if spike_ratio >= multiplier and unusual and not _is_in_cooldown(
                         last_triggered_at, VOLUME_ALERT_COOLDOWN_SECONDS
                     ):
-                        symbol = stats.get("total", {}).get("floor_price_symbol", "ETH")
+                        symbol = snapshot.stats[collection_slug].get("total", {}).get("floor_price_symbol", "ETH")
 
                         message = (
                             f"🚨 *Volume Spike Alert!*\n\n"
@@ -2493,31 +2690,33 @@ async def check_volume_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
                             f"Rata-rata: {avg_volume:.2f} {symbol}\n"
                             f"Spike: *{spike_ratio:.1f}x* 📊"
                         )
-
-                        try:
-                            await context.bot.send_message(
-                                chat_id=user_id,
-                                text=message,
-                                parse_mode=ParseMode.MARKDOWN
-                            )
-                            db.mark_volume_alert_triggered(user_id, collection_slug)
-                        except Exception as e:
-                            logger.error(f"Failed to send volume alert to user {user_id}: {e}")
+                        if zscore is not None:
+                            message += f"\nDeviasi: {zscore:+.1f}σ"
+
+                        await async_db.mark_volume_alert_triggered(
+                            user_id,
+                            collection_slug,
+                            notification=(
+                                f"volume:{user_id}:{collection_slug}:{int(snapshot.taken_at)}",
+                                user_id,
+                                message,
+                            ),
+                        )
 
         except Exception as e:
             logger.error(f"Error checking volume alert for {collection_slug}: {e}")
 
 
-async def check_gas_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Background job to check gas price alerts."""
-    alerts = db.get_all_gas_alerts()
-
+async def check_gas_alerts(context: ContextTypes.DEFAULT_TYPE, snapshot: MarketSnapshot,
+                           alerts) -> None:
+    """Evaluate gas price alerts against the gas reading in the tick's snapshot."""
     if not alerts:
         return
 
-    gas_data = await gas_api.get_gas_price()
-    if gas_data and "error" not in gas_data:
+    gas_data = snapshot.gas
+    if gas_data:
         current_gas = gas_data.get("average", 0)
+        checked_at = int(snapshot.taken_at)
 
         for user_id, target_gwei, alert_type in alerts:
             should_trigger = False
@@ -2536,44 +2735,146 @@ async def check_gas_alerts(context: ContextTypes.DEFAULT_TYPE) -> None:
                 )
 
                 try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=message,
-                        parse_mode=ParseMode.MARKDOWN
+                    await async_db.deactivate_gas_alert(
+                        user_id,
+                        target_gwei,
+                        alert_type,
+                        notification=(f"gas:{user_id}:{target_gwei}:{alert_type}:{checked_at}", user_id, message),
                     )
-                    db.deactivate_gas_alert(user_id, target_gwei, alert_type)
                 except Exception as e:
-                    logger.error(f"Failed to send gas alert to user {user_id}: {e}")
+                    logger.error(f"Failed to trigger gas alert for user {user_id}: {e}")
 
 
-async def record_price_history(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Background job to record price history for all monitored collections."""
-    collections = set(db.get_all_monitored_collection_slugs())
+async def record_price_history(snapshot: MarketSnapshot, collections, started: float) -> None:
+    """Record price history for all monitored collections from a history snapshot.
 
+    All samples of a sweep are written in one transaction; ``started`` is when
+    the sweep's fetches began, for the duration log.
+    """
+    rows = []
+    recorded_at = to_recorded_at(snapshot.taken_at)
     for collection_slug in collections:
-        try:
-            stats = await opensea_api.get_collection_stats(collection_slug)
-            if stats and "error" not in stats:
-                total = stats.get("total", {})
-                floor_price = total.get("floor_price", 0) or 0
-
-                # Get volume data from intervals
-                intervals = stats.get("intervals", [])
-                volume_24h = 0
-                sales_count = 0
-                avg_price = 0
-
-                for interval in intervals:
-                    if interval.get("interval") == "one_day":
-                        volume_24h = interval.get("volume", 0) or 0
-                        sales_count = interval.get("sales", 0) or 0
-                        avg_price = interval.get("average_price", 0) or 0
-                        break
-
-                db.save_price_history(collection_slug, floor_price, volume_24h, sales_count, avg_price)
+        total = snapshot.stats.get(collection_slug, {}).get("total")
+        one_day = snapshot.one_day(collection_slug)
+        if total is None or one_day is None:
+            continue
+        rows.append((
+            collection_slug,
+            total.get("floor_price", 0) or 0,
+            one_day.get("volume", 0) or 0,
+            one_day.get("sales", 0) or 0,
+            one_day.get("average_price", 0) or 0,
+        ))
 
+    try:
+        written = await async_db.save_price_history_batch(rows, recorded_at)
+    except Exception as e:
+        logger.error(f"Error recording price history ({len(rows)} collections): {e}")
+        return
+    if history_store.enabled:
+        # Same timestamp as the SQL rows, so a later catch-up never duplicates them.
+        ts = to_epoch(recorded_at)
+        try:
+            # Collections whose last append failed are refilled from the database
+            # first; that already includes this sweep's rows.
+            await history_store.repair_async()
+            await history_store.append_async([(row[0], ts, *row[1:]) for row in rows])
+            await analytics.refresh(collections)
         except Exception as e:
-            logger.error(f"Error recording price history for {collection_slug}: {e}")
+            logger.error(f"Error updating history store / analytics: {e}")
+    logger.info(
+        f"Price history sweep: {written}/{len(collections)} collections written "
+        f"in {(time.monotonic() - started) * 1000:.0f} ms"
+    )
+
+
+async def prune_price_history(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Background job: roll whole days past the raw retention window into daily rows.
+
+    Works in bounded batches (one transaction each) so the alert cycle never
+    waits long on the database; a large backlog is spread over several runs.
+    """
+    cutoff = (
+        datetime.now(timezone.utc) - timedelta(days=PRICE_HISTORY_RETENTION_DAYS)
+    ).strftime("%Y-%m-%d 00:00:00")
+    started = time.monotonic()
+    removed = 0
+    try:
+        for _ in range(HISTORY_PRUNE_MAX_BATCHES):
+            batch = await async_db.rollup_price_history(cutoff, HISTORY_PRUNE_BATCH_SIZE)
+            removed += batch
+            if batch < HISTORY_PRUNE_BATCH_SIZE:
+                break
+    except Exception as e:
+        logger.error(f"Error pruning price history: {e}")
+    if removed:
+        logger.info(
+            f"Price history rollup: {removed} raw rows before {cutoff} rolled into daily rows "
+            f"in {(time.monotonic() - started) * 1000:.0f} ms"
+        )
+
+
+# Monotonic time when the next price history sample is due (0 = on the first tick).
+_history_due_at = 0.0
+_history_sweep: asyncio.Task | None = None  # running history sweep, if any
+
+
+async def _sweep_price_history(alert_snapshot: MarketSnapshot) -> None:
+    """Fetch the monitored collections the alert tick did not cover and record a history sample."""
+    started = time.monotonic()
+    try:
+        collections = await async_db.get_all_monitored_collection_slugs()
+        snapshot = await take_history_snapshot(collections, alert_snapshot)
+        await record_price_history(snapshot, collections, started)
+    except Exception as e:
+        logger.error(f"Error in price history sweep: {e}")
+
+
+@_upstream_priority(Priority.ALERT)
+async def market_cycle(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Background job: one market snapshot per tick, fed to every alert evaluator.
+
+    Each distinct collection is fetched once per tick no matter how many alert
+    types watch it. Alerts come from the in-memory alert index, and price
+    alerts are only evaluated for keys whose price moved. Gas alerts are
+    checked in the same tick, against a gas reading fetched alongside the
+    snapshot. When a history sample is due, the remaining monitored
+    collections are fetched at HISTORY priority in a separate task, so alert
+    evaluation never waits on them.
+    """
+    global _history_due_at, _history_sweep
+    await alert_index.sync()
+    price_keys = alert_index.price_keys()
+
+    floor_slugs = (
+        [slug for slug, basis in price_keys if basis != "top_offer"]
+        + alert_index.percent_slugs()
+        + alert_index.volume_slugs()
+    )
+    offer_slugs = [slug for slug, basis in price_keys if basis == "top_offer"]
+
+    gas_alerts = alert_index.gas_alerts()
+    snapshot = await take_snapshot(floor_slugs, offer_slugs, include_gas=bool(gas_alerts))
+
+    # Everything this tick triggers is drained together, one digest per user.
+    async with outbox.cycle():
+        await check_alerts(context, snapshot, alert_index.changed_price_keys(snapshot))
+        await check_percentage_alerts(context, snapshot, alert_index.percent_alerts())
+        await check_volume_alerts(context, snapshot, alert_index.volume_alerts())
+        await check_gas_alerts(context, snapshot, gas_alerts)
+
+    # A sweep still running from the last due time is left to finish first.
+    if time.monotonic() >= _history_due_at and (_history_sweep is None or _history_sweep.done()):
+        _history_due_at = time.monotonic() + PRICE_HISTORY_INTERVAL
+        _history_sweep = asyncio.create_task(_sweep_price_history(snapshot))
+
+
+async def drain_notification_outbox(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Background job: hand pending outbox notifications to the notifier."""
+    try:
+        await outbox.drain(wait=False)
+    except Exception as e:
+        logger.error(f"Error draining notification outbox: {e}")
 
 
 # ============== Mint Reminder Commands ==============
@@ -2616,7 +2917,7 @@ async def addmint_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     user_id = update.effective_user.id
-    success = db.add_mint_reminder(user_id, nft_name, mint_price, date_str, mint_link)
+    success = await async_db.add_mint_reminder(user_id, nft_name, mint_price, date_str, mint_link)
 
     if success:
         msg = _format_mint_added(nft_name, mint_price, date_str, mint_link)
@@ -2629,7 +2930,7 @@ async def addmint_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def mints_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List all active mint reminders."""
     user_id = update.effective_user.id
-    reminders = db.get_mint_reminders(user_id)
+    reminders = await async_db.get_mint_reminders(user_id)
 
     if not reminders:
         await update.message.reply_text(
@@ -2659,7 +2960,7 @@ async def removemint_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     user_id = update.effective_user.id
-    success = db.remove_mint_reminder(user_id, reminder_id)
+    success = await async_db.remove_mint_reminder(user_id, reminder_id)
 
     if success:
         await update.message.reply_text(f"✅ Reminder #{reminder_id} berhasil dihapus.")
@@ -2669,7 +2970,7 @@ async def removemint_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def check_mint_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Background job to check and send mint reminders."""
-    reminders = db.get_upcoming_reminders()
+    reminders = await async_db.get_upcoming_reminders()
     now = datetime.now()
 
     for rid, user_id, nft_name, mint_price, mint_date_str, mint_link, reminded_30, reminded_5 in reminders:
@@ -2680,7 +2981,7 @@ async def check_mint_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
 
             # Deactivate if mint time has already passed
             if minutes_until < -5:
-                db.deactivate_mint_reminder(rid)
+                await async_db.deactivate_mint_reminder(rid)
                 continue
 
             should_send = False
@@ -2709,16 +3010,13 @@ async def check_mint_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
                 if mint_link:
                     message += f"\n🔗 [Mint Link]({mint_link})"
 
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=message,
-                        parse_mode=ParseMode.MARKDOWN,
-                        disable_web_page_preview=True
-                    )
-                    db.mark_reminded(rid, reminder_type)
-                except Exception as e:
-                    logger.error(f"Failed to send mint reminder to user {user_id}: {e}")
+                await async_db.mark_reminded(rid, reminder_type)
+                notifier.enqueue(
+                    user_id,
+                    message,
+                    dedupe_key=("mint", rid, reminder_type),
+                    disable_web_page_preview=True,
+                )
 
         except Exception as e:
             logger.error(f"Error checking mint reminder {rid}: {e}")
@@ -2736,7 +3034,13 @@ def main() -> None:
     health_thread.start()
 
     # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -2752,6 +3056,8 @@ def main() -> None:
     application.add_handler(CommandHandler("palert", palert_command))
     application.add_handler(CommandHandler("volume", volume_command))
     application.add_handler(CommandHandler("valert", valert_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("chart", chart_command))
     application.add_handler(CommandHandler("addnft", addnft_command))
     application.add_handler(CommandHandler("removenft", removenft_command))
     application.add_handler(CommandHandler("portfolio", portfolio_command))
@@ -2778,12 +3084,10 @@ def main() -> None:
 
     # Add background jobs
     job_queue = application.job_queue
-    job_queue.run_repeating(check_alerts, interval=ALERT_CHECK_INTERVAL, first=60)
-    job_queue.run_repeating(check_percentage_alerts, interval=ALERT_CHECK_INTERVAL, first=90)
-    job_queue.run_repeating(check_volume_alerts, interval=ALERT_CHECK_INTERVAL, first=120)
-    job_queue.run_repeating(check_gas_alerts, interval=ALERT_CHECK_INTERVAL, first=150)
+    job_queue.run_repeating(market_cycle, interval=ALERT_CHECK_INTERVAL, first=60)
     job_queue.run_repeating(check_mint_reminders, interval=60, first=30)
-    job_queue.run_repeating(record_price_history, interval=PRICE_HISTORY_INTERVAL, first=300)
+    job_queue.run_repeating(drain_notification_outbox, interval=OUTBOX_DRAIN_INTERVAL, first=5)
+    job_queue.run_repeating(prune_price_history, interval=PRICE_HISTORY_INTERVAL, first=300)
 
     # Start the bot
     print("🚀 Bot started! Press Ctrl+C to stop.")
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from rate_limiter import Priority, current_priority
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with a per-entry TTL and single-flight loads.
+
+    Concurrent misses for the same key share one loader call, so 50 users
+    opening ``/check`` for the same collection at once cost one upstream request.
+    A caller only joins a load running at its own priority or a more urgent
+    one: a user command never waits behind an alert or history load queued
+    at background weight.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, tuple[Priority, asyncio.Task]] = {}
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        _caches.append(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value, or None."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get_with_age(self, key: Hashable) -> Optional[tuple[Any, float]]:
+        """Return (value, age in seconds) for an unexpired entry, or None."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age >= self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value, age
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Return the cached value for ``key`` or load it once for all concurrent callers.
+
+        Results rejected by ``cacheable`` (e.g. error dicts) are shared with the
+        callers already waiting but not stored.
+        """
+        value = self.get(key)
+        if value is not None:
+            self._stats["hits"] += 1
+            return value
+
+        if self._joinable(key):
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["misses"] += 1
+        # shield: one caller giving up must not cancel the load for the others.
+        return await asyncio.shield(self.refresh(key, loader, cacheable))
+
+    async def get_stale_while_revalidate(self, key: Hashable, fresh_ttl: float,
+                                         loader: Callable[[], Awaitable[Any]],
+                                         cacheable: Callable[[Any], bool] = lambda value: True):
+        """Serve a cached value at once, revalidating it when older than ``fresh_ttl``.
+
+        Returns ``(value, refresh)``: ``refresh`` is None when ``value`` is fresh
+        or was just loaded, else a task resolving to the reloaded value. Entries
+        older than the cache TTL are not served and are loaded inline.
+        """
+        cached = self.get_with_age(key)
+        if cached is not None:
+            value, age = cached
+            if age < fresh_ttl:
+                self._stats["hits"] += 1
+                return value, None
+            self._stats["stale_hits"] += 1
+            return value, self.refresh(key, loader, cacheable)
+        return await self.get_or_load(key, loader, cacheable), None
+
+    def refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                cacheable: Callable[[Any], bool] = lambda value: True) -> asyncio.Task:
+        """Start (or join) a background reload of ``key``, ignoring any cached value.
+
+        The load runs at the caller's request priority.
+        """
+        task = self._joinable(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, cacheable))
+            self._inflight[key] = (current_priority(), task)
+        return task
+
+    def _joinable(self, key: Hashable) -> Optional[asyncio.Task]:
+        """The in-flight load of ``key`` if it runs at least at the caller's priority."""
+        inflight = self._inflight.get(key)
+        if inflight is None or inflight[0] > current_priority():
+            return None
+        return inflight[1]
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    cacheable: Callable[[Any], bool]) -> Any:
+        try:
+            value = await loader()
+            if value is not None and cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            # A more urgent load may have replaced this one in the meantime.
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[1] is asyncio.current_task():
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        served = self._stats["hits"] + self._stats["stale_hits"] + self._stats["coalesced"]
+        lookups = served + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._data),
+            "in_flight": len(self._inflight),
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches: List[TTLCache] = []
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-cache stats keyed by cache name."""
+    return {cache.name: cache.stats() for cache in _caches}
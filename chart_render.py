@@ -0,0 +1,47 @@
+# Renders /chart images in a separate process: charts.py runs this file as a
+# script, series as JSON on stdin, PNG on stdout. Keep it free of config,
+# database and bot imports, only the standard library and matplotlib.
+import io
+import json
+import sys
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+Series = Tuple[List[int], List[float], List[float]]  # (unix ts, floor, volume_24h), ascending
+
+
+def render_chart(slug: str, range_key: str, series: Series) -> bytes:
+    """Render a floor/volume PNG."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    ts, floors, volumes = series
+    times = [datetime.fromtimestamp(t, timezone.utc) for t in ts]
+    fig, (price_ax, volume_ax) = plt.subplots(
+        2, 1, figsize=(8, 4.5), dpi=100, sharex=True, gridspec_kw={"height_ratios": (3, 1)}
+    )
+    try:
+        price_ax.plot(times, floors, color="#2081e2", linewidth=1.6)
+        price_ax.fill_between(times, floors, min(floors), color="#2081e2", alpha=0.12)
+        price_ax.set_title(f"{slug} · floor {range_key}", loc="left", fontsize=11)
+        price_ax.grid(alpha=0.3)
+        volume_ax.bar(times, volumes, width=(times[-1] - times[0]) / len(times) * 0.8, color="#8a939b")
+        volume_ax.set_ylabel("vol 24h", fontsize=8)
+        volume_ax.grid(alpha=0.3)
+        volume_ax.xaxis.set_major_formatter(
+            mdates.DateFormatter("%H:%M" if range_key == "24h" else "%d %b")
+        )
+        fig.autofmt_xdate()
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    request = json.load(sys.stdin)
+    sys.stdout.buffer.write(render_chart(request["slug"], request["range"], request["series"]))
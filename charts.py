@@ -0,0 +1,135 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from cache import TTLCache
+from chart_render import Series
+from config import CHART_WORKERS, CHART_CACHE_TTL, CHART_CACHE_SIZE
+from database import db
+from history_store import history_store, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Supported /chart ranges -> hours of history.
+CHART_RANGES = {"24h": 24, "7d": 168, "30d": 720}
+
+_RENDER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chart_render.py")
+
+
+@dataclass
+class Chart:
+    """A rendered chart; ``png`` is dropped once Telegram has given it a ``file_id``."""
+    key: Tuple[str, str, int]
+    points: int
+    first_floor: float
+    last_floor: float
+    png: Optional[bytes] = None
+    file_id: Optional[str] = None
+
+
+def _load_series(slug: str, hours: int) -> Series:
+    """History for the last ``hours`` (blocking): the columnar store, else SQL.
+
+    The SQL fallback fills the part of the range that is older than raw
+    retention with daily closes.
+    """
+    since = time.time() - hours * 3600
+    if history_store.enabled:
+        columns = history_store.read(slug, since=since)
+        return columns["ts"].tolist(), columns["floor"].tolist(), columns["volume"].tolist()
+
+    raw = [
+        (to_epoch(recorded_at), floor or 0, volume or 0)
+        for floor, volume, _sales, _avg_price, recorded_at in reversed(db.get_price_history(slug, hours))
+    ]
+    first = raw[0][0] if raw else time.time()
+    daily = []
+    for day, _open, _high, _low, close, volume, _sales, _avg_price in reversed(
+        db.get_daily_price_history(slug, days=hours // 24 + 1)
+    ):
+        ts = to_epoch(f"{day} 23:59:59")
+        if since <= ts < first:
+            daily.append((ts, close or 0, volume or 0))
+    points = [point for point in daily + raw if point[1] > 0]
+    return [p[0] for p in points], [p[1] for p in points], [p[2] for p in points]
+
+
+class ChartService:
+    """Renders /chart images off the event loop and remembers what was sent.
+
+    Each render runs chart_render.py in a fresh interpreter (at most
+    ``workers`` at once), so matplotlib never blocks the loop or holds the
+    GIL. A multiprocessing pool is avoided on purpose: forking this
+    multi-threaded process can leave a lock held in the child, and spawned
+    pool workers re-import the main script, which would open the database.
+
+    Charts are cached per (slug, range, latest sample time): the key
+    changes when a new sample lands, so cached images never go stale.
+    After the first upload the Telegram ``file_id`` is kept and repeat
+    requests resend it without uploading anything.
+    """
+
+    def __init__(self, workers: int, ttl: float, maxsize: int):
+        self.workers = max(1, workers)
+        self.available = importlib.util.find_spec("matplotlib") is not None
+        self._slots = asyncio.Semaphore(self.workers)
+        self._cache = TTLCache("charts", ttl=ttl, maxsize=maxsize)
+        self._stats = {"renders": 0, "render_ms_total": 0.0, "file_id_sends": 0}
+
+    async def get(self, slug: str, range_key: str) -> Optional[Chart]:
+        """Chart for ``slug`` over ``range_key`` (a CHART_RANGES key), or None without history."""
+        slug = slug.lower()
+        series = await asyncio.to_thread(_load_series, slug, CHART_RANGES[range_key])
+        if len(series[0]) < 2:
+            return None
+        key = (slug, range_key, series[0][-1])
+        chart = await self._cache.get_or_load(key, lambda: self._render(key, series))
+        if chart.file_id:
+            self._stats["file_id_sends"] += 1
+        return chart
+
+    async def _render(self, key: Tuple[str, str, int], series: Series) -> Chart:
+        request = json.dumps({"slug": key[0], "range": key[1], "series": series}).encode()
+        async with self._slots:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, _RENDER_SCRIPT,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            png, error = await process.communicate(request)
+        if process.returncode != 0:
+            raise RuntimeError(f"Chart render failed for {key[0]}: {error.decode(errors='replace')[-500:]}")
+        self._stats["renders"] += 1
+        self._stats["render_ms_total"] += (time.monotonic() - started) * 1000
+        floors = series[1]
+        return Chart(key=key, points=len(floors), first_floor=floors[0], last_floor=floors[-1], png=png)
+
+    def remember(self, chart: Chart, file_id: str):
+        """Record the file_id Telegram assigned to an uploaded chart."""
+        chart.file_id = file_id
+        chart.png = None
+
+    def forget(self, chart: Chart):
+        """Drop a chart whose file_id Telegram no longer accepts."""
+        self._cache.invalidate(chart.key)
+
+    def stats(self) -> Dict[str, Any]:
+        renders = self._stats["renders"]
+        return {
+            "available": self.available,
+            "renders": renders,
+            "render_ms_avg": round(self._stats["render_ms_total"] / renders, 1) if renders else 0.0,
+            "file_id_sends": self._stats["file_id_sends"],
+        }
+
+
+# Singleton instance, used by /chart
+charts = ChartService(workers=CHART_WORKERS, ttl=CHART_CACHE_TTL, maxsize=CHART_CACHE_SIZE)
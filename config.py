@@ -12,23 +12,122 @@ OPENSEA_API_KEY = os.getenv("OPENSEA_API_KEY", "")
 # OpenSea API Base URL
 OPENSEA_API_BASE_URL = "https://api.opensea.io/api/v2"
 
+# Shared OpenSea connection pool (keep-alive sessions reused across all calls)
+OPENSEA_POOL_LIMIT = int(os.getenv("OPENSEA_POOL_LIMIT", "100"))
+OPENSEA_POOL_LIMIT_PER_HOST = int(os.getenv("OPENSEA_POOL_LIMIT_PER_HOST", "20"))
+OPENSEA_KEEPALIVE_TIMEOUT = float(os.getenv("OPENSEA_KEEPALIVE_TIMEOUT", "60"))  # seconds
+OPENSEA_DNS_CACHE_TTL = int(os.getenv("OPENSEA_DNS_CACHE_TTL", "300"))  # seconds
+
+# OpenSea request pacing (token bucket per API key). The rate adapts between
+# MIN and MAX: it drops on HTTP 429 and climbs back while no 429s are seen.
+OPENSEA_RATE_LIMIT = float(os.getenv("OPENSEA_RATE_LIMIT", "4"))  # requests/second
+OPENSEA_RATE_BURST = int(os.getenv("OPENSEA_RATE_BURST", "8"))
+OPENSEA_RATE_MIN = float(os.getenv("OPENSEA_RATE_MIN", "0.5"))
+OPENSEA_RATE_MAX = float(os.getenv("OPENSEA_RATE_MAX", "10"))
+
+# In-process cache for collection stats (floor, volume, sales), shared by
+# alert jobs and commands. Keep the TTL below ALERT_CHECK_INTERVAL.
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))  # seconds
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "2000"))  # collections
+
+# Stale-while-revalidate cache for the /floor overview (stats, info, sales).
+# Younger than FRESH: served as-is. Younger than SOFT: served immediately and
+# refreshed in the background, editing the message if the numbers changed.
+OVERVIEW_FRESH_TTL = float(os.getenv("OVERVIEW_FRESH_TTL", "30"))  # seconds
+OVERVIEW_SOFT_TTL = float(os.getenv("OVERVIEW_SOFT_TTL", "900"))  # seconds
+OVERVIEW_CACHE_SIZE = int(os.getenv("OVERVIEW_CACHE_SIZE", "500"))  # collections
+
+# Collection metadata (name, chain, links, contracts) changes rarely. It is
+# cached in memory and in the database, and revalidated with a conditional
+# request (ETag / Last-Modified) once older than this.
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", "21600"))  # seconds (6 hours)
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "2000"))  # collections
+
+# Max concurrent collection fetches while taking the per-tick market snapshot.
+# Pacing itself is left to the OpenSea rate limiter.
+MARKET_SNAPSHOT_CONCURRENCY = int(os.getenv("MARKET_SNAPSHOT_CONCURRENCY", "16"))
+
+# Outbound alert notifications. Telegram allows about 30 messages/second per
+# bot and roughly one message/second to the same chat.
+NOTIFY_RATE_LIMIT = float(os.getenv("NOTIFY_RATE_LIMIT", "25"))  # messages/second, bot-wide
+NOTIFY_PER_CHAT_INTERVAL = float(os.getenv("NOTIFY_PER_CHAT_INTERVAL", "1.0"))  # seconds
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "8"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))  # on network errors
+
+# Triggered alerts are written to a database outbox together with the alert
+# state change; a job hands pending rows to the notifier every DRAIN_INTERVAL.
+OUTBOX_DRAIN_INTERVAL = float(os.getenv("OUTBOX_DRAIN_INTERVAL", "2"))  # seconds
+OUTBOX_MAX_IN_FLIGHT = int(os.getenv("OUTBOX_MAX_IN_FLIGHT", "500"))  # rows handed to the notifier at once
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # for sent/failed rows
+
+# Alerts for the same user that are pending together (e.g. everything one
+# cycle triggered) are merged into digest messages of at most this size.
+# Telegram rejects messages over 4096 characters.
+DIGEST_MAX_CHARS = min(int(os.getenv("DIGEST_MAX_CHARS", "3500")), 4000)
+DIGEST_MAX_ITEMS = int(os.getenv("DIGEST_MAX_ITEMS", "15"))  # alerts per message
+
 # Check interval for price alerts (in seconds)
 ALERT_CHECK_INTERVAL = 120  # 2 minutes
 
 # Price history recording interval (in seconds)
 PRICE_HISTORY_INTERVAL = 3600  # 1 hour
 
+# Raw hourly price history is kept this many days; older samples are rolled
+# into daily OHLC rows (price_history_daily) and deleted in bounded batches.
+# At least 8 days are kept because the 7-day volume average reads raw rows.
+PRICE_HISTORY_RETENTION_DAYS = max(8, int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "30")))
+HISTORY_PRUNE_BATCH_SIZE = int(os.getenv("HISTORY_PRUNE_BATCH_SIZE", "5000"))  # rows per transaction
+HISTORY_PRUNE_MAX_BATCHES = int(os.getenv("HISTORY_PRUNE_MAX_BATCHES", "20"))  # per run
+
 # Cooldown for repeat volume spike alerts (in seconds)
 VOLUME_ALERT_COOLDOWN_SECONDS = int(os.getenv("VOLUME_ALERT_COOLDOWN_SECONDS", "21600"))  # 6 hours
 
 # Volume spike detection multiplier (e.g., 2.0 = 2x average)
 VOLUME_SPIKE_MULTIPLIER = 2.0
 
+# Volume spikes are measured against a per-collection baseline: an
+# exponentially weighted mean/variance of the hourly 24h-volume samples,
+# updated on every history write. Samples beyond CLAMP_SIGMAS are clipped
+# before they enter the baseline so past spikes barely move it.
+VOLUME_BASELINE_HALF_LIFE_HOURS = float(os.getenv("VOLUME_BASELINE_HALF_LIFE_HOURS", "72"))
+VOLUME_BASELINE_CLAMP_SIGMAS = float(os.getenv("VOLUME_BASELINE_CLAMP_SIGMAS", "3"))
+VOLUME_BASELINE_MIN_SAMPLES = int(os.getenv("VOLUME_BASELINE_MIN_SAMPLES", "24"))
+# Besides the user's multiplier, a spike must sit this many standard
+# deviations above the baseline (once it has MIN_SAMPLES samples).
+VOLUME_SPIKE_MIN_ZSCORE = float(os.getenv("VOLUME_SPIKE_MIN_ZSCORE", "3"))
+
 # Etherscan API Key for gas price
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY", "")
 
 # PostgreSQL database URL. If set, the bot uses Postgres instead of SQLite.
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
+# Postgres connection pool (only used with DATABASE_URL). Idle connections are
+# recycled after MAX_IDLE and every connection is replaced after MAX_LIFETIME.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # seconds
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # seconds
+
 # SQLite database file used when DATABASE_URL is not set.
 DATABASE_FILE = os.getenv("DATABASE_FILE", "nft_tracker.db")
+
+# Memory-mapped columnar copy of price history (needs numpy), one directory
+# per collection. Rebuilt from the database if missing.
+HISTORY_STORE_DIR = os.getenv(
+    "HISTORY_STORE_DIR", os.path.join(os.path.dirname(DATABASE_FILE) or ".", "history_store")
+)
+# Collections kept memory-mapped at once; each holds five open file descriptors.
+HISTORY_STORE_MAX_OPEN = int(os.getenv("HISTORY_STORE_MAX_OPEN", "32"))
+
+# Window and EWMA span of the price history analytics behind /stats.
+ANALYTICS_WINDOW_HOURS = int(os.getenv("ANALYTICS_WINDOW_HOURS", "168"))  # 7 days
+ANALYTICS_EWMA_SPAN_HOURS = float(os.getenv("ANALYTICS_EWMA_SPAN_HOURS", "24"))
+
+# /chart images are rendered with matplotlib in child processes (at most
+# CHART_WORKERS at once) and cached per (collection, range, latest sample);
+# sent charts are reused by Telegram file_id.
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_CACHE_TTL = float(os.getenv("CHART_CACHE_TTL", "7200"))  # seconds
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "500"))  # charts
@@ -1,6 +1,24 @@
+import asyncio
+import functools
 import sqlite3
-from typing import List, Optional, Tuple
-from config import DATABASE_FILE, DATABASE_URL
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import (
+    DATABASE_FILE,
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_IDLE,
+    DB_POOL_MAX_LIFETIME,
+    PRICE_HISTORY_INTERVAL,
+    VOLUME_BASELINE_HALF_LIFE_HOURS,
+    VOLUME_BASELINE_CLAMP_SIGMAS,
+    VOLUME_BASELINE_MIN_SAMPLES,
+)
 
 
 def _translate_postgres_sql(sql: str) -> str:
@@ -13,6 +31,48 @@ def _translate_postgres_sql(sql: str) -> str:
     return sql.replace("?", "%s")
 
 
+# Max bound parameters per IN (...) list; older SQLite builds allow 999 in total.
+_IN_CHUNK_SIZE = 500
+
+
+# Window of the incrementally maintained volume average (volume_rollup).
+VOLUME_ROLLUP_HOURS = 168
+
+# A rollup that has not been advanced for this long past its window (the
+# collection stopped being sampled) is not trusted; callers scan instead.
+_VOLUME_ROLLUP_SLACK_HOURS = 2
+
+
+def _chunks(items: List, size: int = _IN_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Per-sample EWMA weight of the volume baseline.
+_VOLUME_BASELINE_ALPHA = 1 - 0.5 ** (
+    PRICE_HISTORY_INTERVAL / max(1.0, VOLUME_BASELINE_HALF_LIFE_HOURS * 3600)
+)
+
+
+def _advance_volume_baseline(state: Tuple[float, float, int], volume: float) -> Tuple[float, float, int]:
+    """Fold one volume sample into a (mean, variance, sample_count) baseline.
+
+    The first samples are plain running averages; after that the weight
+    settles at the EWMA alpha. Once the baseline is warm, samples are clipped
+    to mean +/- CLAMP_SIGMAS standard deviations so a spike shifts it by at
+    most a few sigmas' worth instead of by its full size.
+    """
+    mean, variance, count = state
+    if count >= VOLUME_BASELINE_MIN_SAMPLES and variance > 0:
+        band = VOLUME_BASELINE_CLAMP_SIGMAS * variance ** 0.5
+        volume = min(max(volume, mean - band), mean + band)
+    alpha = max(_VOLUME_BASELINE_ALPHA, 1.0 / (count + 1))
+    diff = volume - mean
+    mean += alpha * diff
+    variance = (1 - alpha) * (variance + alpha * diff * diff)
+    return mean, variance, count + 1
+
+
 class _PostgresCursor:
     """Cursor wrapper that lets existing SQLite-style queries run on psycopg."""
 
@@ -22,6 +82,9 @@ class _PostgresCursor:
     def execute(self, sql: str, params=None):
         return self._cursor.execute(_translate_postgres_sql(sql), params)
 
+    def executemany(self, sql: str, params_seq):
+        return self._cursor.executemany(_translate_postgres_sql(sql), params_seq)
+
     def fetchone(self):
         return self._cursor.fetchone()
 
@@ -34,10 +97,15 @@ class _PostgresCursor:
 
 
 class _PostgresConnection:
-    """Connection wrapper returning Postgres cursors with SQL translation."""
+    """Pooled connection wrapper returning Postgres cursors with SQL translation.
 
-    def __init__(self, connection):
+    ``close()`` hands the connection back to the pool instead of closing it;
+    the pool rolls back anything left uncommitted.
+    """
+
+    def __init__(self, connection, pool):
         self._connection = connection
+        self._pool = pool
 
     def cursor(self):
         return _PostgresCursor(self._connection.cursor())
@@ -46,7 +114,16 @@ class _PostgresConnection:
         self._connection.commit()
 
     def close(self):
-        self._connection.close()
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.putconn(connection)
+
+    def __del__(self):
+        # Methods that raise before close() must not leak a pool slot.
+        try:
+            self.close()
+        except Exception:
+            pass
 
 
 class Database:
@@ -56,24 +133,137 @@ class Database:
         self.database_url = DATABASE_URL
         self.is_postgres = bool(self.database_url)
         self.db_file = DATABASE_FILE
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Updated from every executor thread, read by the health server's thread.
+        self._pool_stats_lock = threading.Lock()
+        self._pool_stats = {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        self._change_listeners: List[Callable[[str, Optional[str]], None]] = []
         self._init_db()
 
+    def add_change_listener(self, listener: Callable[[str, Optional[str]], None]):
+        """Call ``listener(kind, collection_slug)`` after alerts change.
+
+        ``kind`` is 'price', 'percent', 'volume' or 'gas'; ``collection_slug``
+        is None when the change is not tied to one collection (gas alerts).
+        Listeners run on the calling (possibly worker) thread and must be quick.
+        """
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, kind: str, collection_slug: Optional[str] = None):
+        for listener in self._change_listeners:
+            listener(kind, collection_slug.lower() if collection_slug else None)
+
+    def _select_for_slugs(self, sql: str, collection_slugs: Optional[List[str]]) -> List[Tuple]:
+        """Run ``sql`` (ending in a WHERE clause), restricted to ``collection_slugs`` if given."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        if collection_slugs is None:
+            cursor.execute(sql)
+            results = cursor.fetchall()
+        else:
+            results = []
+            slugs = list(dict.fromkeys(slug.lower() for slug in collection_slugs))
+            for chunk in _chunks(slugs):
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(f"{sql} AND collection_slug IN ({placeholders})", chunk)
+                results.extend(cursor.fetchall())
+        conn.close()
+        return results
+
+    def _delete_alert_by_id(self, table: str, kind: str, user_id: int, alert_id: int,
+                            has_slug: bool = True) -> bool:
+        """Delete one of a user's alerts by ID and notify change listeners."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        slug = None
+        if has_slug:
+            cursor.execute(
+                f"SELECT collection_slug FROM {table} WHERE id = ? AND user_id = ?",
+                (alert_id, user_id)
+            )
+            row = cursor.fetchone()
+            slug = row[0] if row else None
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id = ? AND user_id = ?",
+            (alert_id, user_id)
+        )
+        affected = cursor.rowcount
+        conn.commit()
+        conn.close()
+        if affected > 0:
+            self._notify_change(kind, slug)
+        return affected > 0
+
+    def _get_pool(self):
+        """Create the shared Postgres connection pool on first use."""
+        if self._pool is not None:
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None:
+                try:
+                    from psycopg_pool import ConnectionPool
+                except ImportError as exc:
+                    raise RuntimeError(
+                        "DATABASE_URL is set, but psycopg/psycopg-pool is not installed. "
+                        "Run pip install -r requirements.txt."
+                    ) from exc
+                database_url = self.database_url
+                if database_url.startswith("postgres://"):
+                    database_url = "postgresql://" + database_url[len("postgres://"):]
+                self._pool = ConnectionPool(
+                    database_url,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=max(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    # Managed Postgres drops idle connections; test before handing out.
+                    check=ConnectionPool.check_connection,
+                    name="nft-tracker",
+                    open=True,
+                )
+        return self._pool
+
     def _get_connection(self):
         """Get a database connection"""
         if self.is_postgres:
-            try:
-                import psycopg
-            except ImportError as exc:
-                raise RuntimeError(
-                    "DATABASE_URL is set, but psycopg is not installed. "
-                    "Run pip install -r requirements.txt."
-                ) from exc
-            database_url = self.database_url
-            if database_url.startswith("postgres://"):
-                database_url = "postgresql://" + database_url[len("postgres://"):]
-            return _PostgresConnection(psycopg.connect(database_url))
+            pool = self._get_pool()
+            started = time.monotonic()
+            connection = pool.getconn()
+            waited = time.monotonic() - started
+            with self._pool_stats_lock:
+                self._pool_stats["checkouts"] += 1
+                self._pool_stats["wait_seconds"] += waited
+                self._pool_stats["max_wait_seconds"] = max(self._pool_stats["max_wait_seconds"], waited)
+            return _PostgresConnection(connection, pool)
         return sqlite3.connect(self.db_file)
 
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool usage for /metrics (empty on SQLite)."""
+        if self._pool is None:
+            return {}
+        with self._pool_stats_lock:
+            stats = dict(self._pool_stats)
+        checkouts = stats["checkouts"]
+        pool = self._pool.get_stats()
+        return {
+            "size": pool.get("pool_size", 0),
+            "available": pool.get("pool_available", 0),
+            "waiting": pool.get("requests_waiting", 0),
+            "checkouts": checkouts,
+            "avg_wait_ms": round(stats["wait_seconds"] * 1000 / checkouts, 2) if checkouts else 0.0,
+            "max_wait_ms": round(stats["max_wait_seconds"] * 1000, 2),
+            "timeouts": pool.get("requests_errors", 0),
+            "connections_lost": pool.get("connections_lost", 0),
+        }
+
+    def close(self):
+        """Close the Postgres pool (no-op on SQLite)."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
     def _column_exists(self, cursor, table: str, column_name: str) -> bool:
         if self.is_postgres:
             cursor.execute(
@@ -156,6 +346,25 @@ class Database:
             )
         """)
 
+        # Daily rollups of price history older than the raw retention window.
+        # Floors are open/high/low/close of the day's samples; volume, sales and
+        # avg_price are sums over sample_count samples.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_history_daily (
+                collection_slug TEXT NOT NULL,
+                day TEXT NOT NULL,
+                open_floor REAL NOT NULL,
+                high_floor REAL NOT NULL,
+                low_floor REAL NOT NULL,
+                close_floor REAL NOT NULL,
+                volume_sum REAL NOT NULL DEFAULT 0,
+                sales_sum INTEGER NOT NULL DEFAULT 0,
+                avg_price_sum REAL NOT NULL DEFAULT 0,
+                sample_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (collection_slug, day)
+            )
+        """)
+
         # Table for percentage-based alerts
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS percentage_alerts (
@@ -249,6 +458,70 @@ class Database:
             )
         """)
 
+        # Cache of rarely-changing OpenSea collection metadata (name, chain,
+        # links, contracts). fetched_at is a unix timestamp.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS collection_metadata (
+                collection_slug TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+
+        # Last price each (collection, basis) was checked at. Recurring price
+        # alerts that already fired only fire again when the price crosses
+        # their target between two checks.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_alert_observations (
+                collection_slug TEXT NOT NULL,
+                price_basis TEXT NOT NULL,
+                last_price REAL NOT NULL,
+                observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (collection_slug, price_basis)
+            )
+        """)
+
+        # Running 7-day volume sum/count per collection, maintained on every
+        # history write: samples are added on insert and subtracted once they
+        # fall out of the window (recorded_at < expired_through is subtracted).
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS volume_rollup (
+                collection_slug TEXT PRIMARY KEY,
+                volume_sum REAL NOT NULL DEFAULT 0,
+                sample_count INTEGER NOT NULL DEFAULT 0,
+                expired_through TIMESTAMP NOT NULL
+            )
+        """)
+
+        # Robust volume baseline per collection (see _advance_volume_baseline),
+        # advanced on every history write so spike checks are a key lookup.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS volume_baseline (
+                collection_slug TEXT PRIMARY KEY,
+                mean_volume REAL NOT NULL,
+                variance REAL NOT NULL,
+                sample_count INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Outbox of alert notifications, written in the same transaction as
+        # the alert state change and drained by the notifier. dedupe_key makes
+        # re-running a cycle's writes harmless.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dedupe_key TEXT NOT NULL UNIQUE,
+                user_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at TIMESTAMP
+            )
+        """)
+
         cursor.execute(
             "CREATE INDEX IF NOT EXISTS idx_price_alerts_active ON price_alerts(is_active, collection_slug)"
         )
@@ -264,6 +537,21 @@ class Database:
         cursor.execute(
             "CREATE INDEX IF NOT EXISTS idx_slug_aliases_user ON slug_aliases(user_id, alias)"
         )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notification_outbox_status ON notification_outbox(status, id)"
+        )
+
+        # Seed rollups for collections that already have history.
+        window = f"-{VOLUME_ROLLUP_HOURS}"
+        cursor.execute(
+            """INSERT INTO volume_rollup (collection_slug, volume_sum, sample_count, expired_through)
+               SELECT collection_slug, SUM(volume_24h), COUNT(*), datetime('now', ? || ' hours')
+               FROM price_history
+               WHERE recorded_at >= datetime('now', ? || ' hours')
+               GROUP BY collection_slug
+               ON CONFLICT(collection_slug) DO NOTHING""",
+            (window, window)
+        )
 
         conn.commit()
         conn.close()
@@ -387,6 +675,7 @@ class Database:
                     (1 if is_recurring else 0, current_price, row[0])
                 )
                 conn.commit()
+                self._notify_change("price", slug)
                 return True
 
             cursor.execute(
@@ -398,6 +687,7 @@ class Database:
                  price_basis, 1 if is_recurring else 0, current_price)
             )
             conn.commit()
+            self._notify_change("price", slug)
             return True
         except Exception as exc:
             if self._is_integrity_error(exc):
@@ -418,60 +708,26 @@ class Database:
         affected = cursor.rowcount
         conn.commit()
         conn.close()
+        if affected > 0:
+            self._notify_change("price", collection_slug)
 
         return affected > 0
 
     def remove_alert_by_id(self, user_id: int, alert_id: int) -> bool:
         """Remove a specific alert by ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM price_alerts WHERE id = ? AND user_id = ?",
-            (alert_id, user_id)
-        )
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return affected > 0
+        return self._delete_alert_by_id("price_alerts", "price", user_id, alert_id)
 
     def remove_percent_alert_by_id(self, user_id: int, alert_id: int) -> bool:
         """Remove a specific percentage alert by ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM percentage_alerts WHERE id = ? AND user_id = ?",
-            (alert_id, user_id)
-        )
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return affected > 0
+        return self._delete_alert_by_id("percentage_alerts", "percent", user_id, alert_id)
 
     def remove_volume_alert_by_id(self, user_id: int, alert_id: int) -> bool:
         """Remove a specific volume alert by ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM volume_alerts WHERE id = ? AND user_id = ?",
-            (alert_id, user_id)
-        )
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return affected > 0
+        return self._delete_alert_by_id("volume_alerts", "volume", user_id, alert_id)
 
     def remove_gas_alert_by_id(self, user_id: int, alert_id: int) -> bool:
         """Remove a specific gas alert by ID"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM gas_alerts WHERE id = ? AND user_id = ?",
-            (alert_id, user_id)
-        )
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return affected > 0
+        return self._delete_alert_by_id("gas_alerts", "gas", user_id, alert_id, has_slug=False)
 
     def get_user_alerts(self, user_id: int) -> List[Tuple]:
         """Get all active alerts for a user with IDs"""
@@ -488,87 +744,186 @@ class Database:
 
         return alerts
 
-    def get_all_active_alerts(self) -> List[Tuple]:
-        """Get all active alerts for checking"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """SELECT user_id, collection_slug, target_price, alert_type,
+    def get_all_active_alerts(self, collection_slugs: Optional[List[str]] = None) -> List[Tuple]:
+        """Get all active alerts for checking, optionally only for some collections"""
+        return self._select_for_slugs(
+            """SELECT id, user_id, collection_slug, target_price, alert_type,
                       is_recurring, current_price_at_set, triggered_at, price_basis
-               FROM price_alerts WHERE is_active = 1"""
+               FROM price_alerts WHERE is_active = 1""",
+            collection_slugs
         )
-        alerts = cursor.fetchall()
-        conn.close()
-
-        return alerts
 
-    def deactivate_alert(self, user_id: int, collection_slug: str, target_price: float,
-                         alert_type: str, current_price: Optional[float] = None,
-                         price_basis: str = "floor"):
-        """Mark an alert as triggered/inactive. If recurring, reset reference price instead."""
+    def get_price_alert_observations(self) -> Dict[Tuple[str, str], float]:
+        """Last checked price per (collection_slug, price_basis)."""
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.execute("SELECT collection_slug, price_basis, last_price FROM price_alert_observations")
+        results = {(slug, basis): price for slug, basis, price in cursor.fetchall()}
+        conn.close()
+        return results
 
-        # Check if recurring
-        cursor.execute(
-            """SELECT is_recurring FROM price_alerts
-               WHERE user_id = ? AND collection_slug = ? AND target_price = ?
-               AND alert_type = ? AND price_basis = ? AND is_active = 1""",
-            (user_id, collection_slug.lower(), target_price, alert_type, price_basis)
-        )
-        row = cursor.fetchone()
-        price_update = current_price if current_price is not None else 0
-        if row and row[0] == 1:
-            # Recurring: update triggered_at but keep active
-            cursor.execute(
-                """UPDATE price_alerts
-                   SET triggered_at = CURRENT_TIMESTAMP, current_price_at_set = ?
-                   WHERE user_id = ? AND collection_slug = ? AND target_price = ?
-                   AND alert_type = ? AND price_basis = ?""",
-                (price_update, user_id, collection_slug.lower(), target_price, alert_type, price_basis)
+    def apply_price_alert_updates(self, observations: List[Tuple[str, str, float]],
+                                  triggered: List[Tuple[int, float]],
+                                  notifications: List[Tuple[str, int, str]] = ()) -> int:
+        """Write one alert-check cycle's state changes in a single transaction.
+
+        ``observations`` are (collection_slug, price_basis, price) checked this
+        cycle; ``triggered`` are (alert_id, trigger_price) pairs. Triggered
+        recurring alerts stay active; the rest are deactivated. ``notifications``
+        go to the outbox in the same transaction. Returns the number of alert
+        rows written. Change listeners are not notified: the alert cycle
+        applies the same updates to its in-memory index.
+        """
+        if not observations and not triggered and not notifications:
+            return 0
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        written = 0
+        if observations:
+            cursor.executemany(
+                """INSERT INTO price_alert_observations (collection_slug, price_basis, last_price)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(collection_slug, price_basis)
+                   DO UPDATE SET last_price = ?, observed_at = CURRENT_TIMESTAMP""",
+                [(slug, basis, price, price) for slug, basis, price in observations]
             )
-        else:
-            cursor.execute(
+            written += len(observations)
+        if triggered:
+            cursor.executemany(
                 """UPDATE price_alerts
-                   SET is_active = 0, triggered_at = CURRENT_TIMESTAMP, current_price_at_set = ?
-                   WHERE user_id = ? AND collection_slug = ? AND target_price = ?
-                   AND alert_type = ? AND price_basis = ?""",
-                (price_update, user_id, collection_slug.lower(), target_price, alert_type, price_basis)
+                   SET triggered_at = CURRENT_TIMESTAMP, current_price_at_set = ?,
+                       is_active = CASE WHEN is_recurring = 1 THEN 1 ELSE 0 END
+                   WHERE id = ? AND is_active = 1""",
+                [(price, alert_id) for alert_id, price in triggered]
             )
+            written += max(cursor.rowcount, 0)
+        self._queue_notifications(cursor, notifications)
         conn.commit()
         conn.close()
+        return written
 
-    def update_price_alert_observed_price(self, user_id: int, collection_slug: str,
-                                          target_price: float, alert_type: str,
-                                          current_price: float, price_basis: str = "floor"):
-        """Store the latest checked price so recurring alerts trigger on crossing."""
+    # ============== Price History Methods ==============
+
+    def save_price_history_batch(self, rows: List[Tuple[str, float, float, int, float]],
+                                 recorded_at: Optional[str] = None) -> int:
+        """Save many (slug, floor_price, volume_24h, sales_count, avg_price) snapshots.
+
+        Uses multi-row INSERTs in a single transaction. ``recorded_at`` (UTC,
+        'YYYY-MM-DD HH:MM:SS') stamps every row; defaults to now. Returns rows written.
+        """
+        if not rows:
+            return 0
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute(
-            """UPDATE price_alerts SET current_price_at_set = ?
-               WHERE user_id = ? AND collection_slug = ? AND target_price = ?
-               AND alert_type = ? AND price_basis = ? AND is_active = 1""",
-            (current_price, user_id, collection_slug.lower(), target_price, alert_type, price_basis)
+        slugs = list(dict.fromkeys(row[0].lower() for row in rows))
+        # Seed missing rollups from existing history before adding the new samples.
+        self._seed_volume_rollups(cursor, slugs)
+        self._advance_volume_baselines(cursor, rows)
+        # Six parameters per row, so keep each statement within the IN chunk limit.
+        for chunk in _chunks(rows, _IN_CHUNK_SIZE // 6):
+            placeholders = ", ".join("(?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))" for _ in chunk)
+            params = [value for row in chunk for value in (row[0].lower(), *row[1:5], recorded_at)]
+            cursor.execute(
+                f"""INSERT INTO price_history
+                        (collection_slug, floor_price, volume_24h, sales_count, avg_price, recorded_at)
+                    VALUES {placeholders}""",
+                params
+            )
+        cursor.executemany(
+            """UPDATE volume_rollup
+               SET volume_sum = volume_sum + ?, sample_count = sample_count + 1
+               WHERE collection_slug = ?""",
+            [(row[2] or 0, row[0].lower()) for row in rows]
         )
+        self._expire_volume_rollups(cursor, slugs)
         conn.commit()
         conn.close()
+        return len(rows)
+
+    def _seed_volume_rollups(self, cursor, slugs: List[str]):
+        """Create rollups for collections that do not have one yet."""
+        window = f"-{VOLUME_ROLLUP_HOURS}"
+        existing = set()
+        for chunk in _chunks(slugs):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"SELECT collection_slug FROM volume_rollup WHERE collection_slug IN ({placeholders})",
+                chunk
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+        for slug in slugs:
+            if slug in existing:
+                continue
+            cursor.execute(
+                """INSERT INTO volume_rollup (collection_slug, volume_sum, sample_count, expired_through)
+                   SELECT ?, COALESCE(SUM(volume_24h), 0), COUNT(*), datetime('now', ? || ' hours')
+                   FROM price_history
+                   WHERE collection_slug = ? AND recorded_at >= datetime('now', ? || ' hours')""",
+                (slug, window, slug, window)
+            )
 
-    # ============== Price History Methods ==============
-
-    def save_price_history(self, collection_slug: str, floor_price: float,
-                           volume_24h: float, sales_count: int, avg_price: float):
-        """Save price snapshot for history tracking"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _advance_volume_baselines(self, cursor, rows: List[Tuple[str, float, float, int, float]]):
+        """Fold new samples into volume_baseline, replaying recent history for new collections."""
+        slugs = list(dict.fromkeys(row[0].lower() for row in rows))
+        baselines: Dict[str, Tuple[float, float, int]] = {}
+        for chunk in _chunks(slugs):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"""SELECT collection_slug, mean_volume, variance, sample_count FROM volume_baseline
+                    WHERE collection_slug IN ({placeholders})""",
+                chunk
+            )
+            baselines.update({slug: (mean, variance, count) for slug, mean, variance, count in cursor.fetchall()})
 
-        cursor.execute(
-            """INSERT INTO price_history (collection_slug, floor_price, volume_24h, sales_count, avg_price)
-               VALUES (?, ?, ?, ?, ?)""",
-            (collection_slug.lower(), floor_price, volume_24h, sales_count, avg_price)
+        missing = [slug for slug in slugs if slug not in baselines]
+        for chunk in _chunks(missing):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"""SELECT collection_slug, volume_24h FROM price_history
+                    WHERE collection_slug IN ({placeholders})
+                    AND recorded_at >= datetime('now', ? || ' hours')
+                    ORDER BY collection_slug, recorded_at""",
+                (*chunk, f"-{VOLUME_ROLLUP_HOURS}")
+            )
+            for slug, volume in cursor.fetchall():
+                baselines[slug] = _advance_volume_baseline(baselines.get(slug, (0.0, 0.0, 0)), volume or 0)
+
+        for row in rows:
+            slug = row[0].lower()
+            baselines[slug] = _advance_volume_baseline(baselines.get(slug, (0.0, 0.0, 0)), row[2] or 0)
+
+        cursor.executemany(
+            """INSERT INTO volume_baseline (collection_slug, mean_volume, variance, sample_count, updated_at)
+               VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+               ON CONFLICT(collection_slug) DO UPDATE SET
+                   mean_volume = excluded.mean_volume, variance = excluded.variance,
+                   sample_count = excluded.sample_count, updated_at = excluded.updated_at""",
+            [(slug, *baselines[slug]) for slug in slugs]
         )
-        conn.commit()
-        conn.close()
+
+    def _expire_volume_rollups(self, cursor, slugs: List[str]):
+        """Subtract samples that left the window since the last write."""
+        window = f"-{VOLUME_ROLLUP_HOURS}"
+        for chunk in _chunks(slugs):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"""UPDATE volume_rollup
+                    SET volume_sum = volume_sum - COALESCE((
+                            SELECT SUM(h.volume_24h) FROM price_history h
+                            WHERE h.collection_slug = volume_rollup.collection_slug
+                            AND h.recorded_at >= volume_rollup.expired_through
+                            AND h.recorded_at < datetime('now', ? || ' hours')
+                        ), 0),
+                        sample_count = sample_count - (
+                            SELECT COUNT(*) FROM price_history h
+                            WHERE h.collection_slug = volume_rollup.collection_slug
+                            AND h.recorded_at >= volume_rollup.expired_through
+                            AND h.recorded_at < datetime('now', ? || ' hours')
+                        ),
+                        expired_through = datetime('now', ? || ' hours')
+                    WHERE collection_slug IN ({placeholders})""",
+                (window, window, window, *chunk)
+            )
 
     def get_price_history(self, collection_slug: str, hours: int = 24) -> List[Tuple]:
         """Get price history for a collection within the last N hours"""
@@ -587,21 +942,167 @@ class Database:
         conn.close()
         return results
 
-    def get_oldest_price(self, collection_slug: str, hours: int = 24) -> Optional[float]:
-        """Get the oldest recorded price within N hours for percentage calculation"""
+    def get_history_slugs(self) -> List[str]:
+        """Collections with raw price history."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT collection_slug FROM price_history")
+        results = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return results
+
+    def get_price_history_since(self, collection_slug: str, since: Optional[str] = None) -> List[Tuple]:
+        """Raw history recorded after ``since`` (all if None), oldest first.
+
+        Rows are (recorded_at, floor_price, volume_24h, sales_count, avg_price).
+        """
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.execute(
+            """SELECT recorded_at, floor_price, volume_24h, sales_count, avg_price
+               FROM price_history
+               WHERE collection_slug = ? AND recorded_at > ?
+               ORDER BY recorded_at, id""",
+            (collection_slug.lower(), since or "1970-01-01 00:00:00")
+        )
+        results = cursor.fetchall()
+        conn.close()
+        return results
+
+    def get_daily_price_history(self, collection_slug: str, days: int = 90) -> List[Tuple]:
+        """Daily rollups of the last N days, newest first.
 
+        Rows are (day, open, high, low, close, avg volume_24h, sales_sum, avg price).
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
         cursor.execute(
-            """SELECT floor_price FROM price_history
-               WHERE collection_slug = ?
-               AND recorded_at >= datetime('now', ? || ' hours')
-               ORDER BY recorded_at ASC LIMIT 1""",
-            (collection_slug.lower(), f"-{hours}")
+            """SELECT day, open_floor, high_floor, low_floor, close_floor,
+                      volume_sum / sample_count, sales_sum, avg_price_sum / sample_count
+               FROM price_history_daily
+               WHERE collection_slug = ? AND day >= ? AND sample_count > 0
+               ORDER BY day DESC""",
+            (collection_slug.lower(), since)
+        )
+        results = cursor.fetchall()
+        conn.close()
+        return results
+
+    def rollup_price_history(self, before: str, batch_size: int = 5000) -> int:
+        """Roll one batch of raw samples recorded before ``before`` into daily rows and delete them.
+
+        Samples are taken oldest first, so a day split across batches keeps the
+        open of its first batch and the close of its last. Returns the number
+        of raw rows removed; fewer than ``batch_size`` means nothing is left.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT id, collection_slug, floor_price, volume_24h, sales_count, avg_price, recorded_at
+               FROM price_history
+               WHERE recorded_at < ?
+               ORDER BY id LIMIT ?""",
+            (before, batch_size)
         )
-        result = cursor.fetchone()
+        rows = cursor.fetchall()
+        if not rows:
+            conn.close()
+            return 0
+
+        # [open, high, low, close, volume_sum, sales_sum, avg_price_sum, sample_count]
+        days: Dict[Tuple[str, str], List] = {}
+        for _id, slug, floor, volume, sales, avg_price, recorded_at in rows:
+            floor = floor or 0
+            day = days.get((slug, str(recorded_at)[:10]))
+            if day is None:
+                days[(slug, str(recorded_at)[:10])] = [
+                    floor, floor, floor, floor, volume or 0, sales or 0, avg_price or 0, 1
+                ]
+                continue
+            day[1] = max(day[1], floor)
+            day[2] = min(day[2], floor)
+            day[3] = floor
+            day[4] += volume or 0
+            day[5] += sales or 0
+            day[6] += avg_price or 0
+            day[7] += 1
+
+        # Merge with what earlier batches already rolled up for the same days.
+        slugs_by_day: Dict[str, List[str]] = {}
+        for slug, day in days:
+            slugs_by_day.setdefault(day, []).append(slug)
+        for day, slugs in slugs_by_day.items():
+            for chunk in _chunks(slugs):
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(
+                    f"""SELECT collection_slug, open_floor, high_floor, low_floor,
+                               volume_sum, sales_sum, avg_price_sum, sample_count
+                        FROM price_history_daily
+                        WHERE day = ? AND collection_slug IN ({placeholders})""",
+                    (day, *chunk)
+                )
+                for slug, open_, high, low, volume, sales, avg_price, count in cursor.fetchall():
+                    merged = days[(slug, day)]
+                    merged[0] = open_
+                    merged[1] = max(merged[1], high)
+                    merged[2] = min(merged[2], low)
+                    merged[4] += volume
+                    merged[5] += sales
+                    merged[6] += avg_price
+                    merged[7] += count
+
+        cursor.executemany(
+            """INSERT INTO price_history_daily
+                   (collection_slug, day, open_floor, high_floor, low_floor, close_floor,
+                    volume_sum, sales_sum, avg_price_sum, sample_count)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(collection_slug, day) DO UPDATE SET
+                   open_floor = excluded.open_floor, high_floor = excluded.high_floor,
+                   low_floor = excluded.low_floor, close_floor = excluded.close_floor,
+                   volume_sum = excluded.volume_sum, sales_sum = excluded.sales_sum,
+                   avg_price_sum = excluded.avg_price_sum, sample_count = excluded.sample_count""",
+            [(slug, day, *values) for (slug, day), values in days.items()]
+        )
+        for chunk in _chunks([row[0] for row in rows]):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(f"DELETE FROM price_history WHERE id IN ({placeholders})", chunk)
+        # A rollup that still has to subtract samples from before ``before``
+        # can no longer do so; drop it and let the next write re-seed it.
+        cursor.execute("DELETE FROM volume_rollup WHERE expired_through < ?", (before,))
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+    def get_oldest_prices(self, collection_slugs: List[str], hours: int = 24) -> Dict[str, float]:
+        """Oldest recorded price within N hours for many collections in one query.
+
+        Collections without history in the window are left out.
+        """
+        slugs = list(dict.fromkeys(slug.lower() for slug in collection_slugs))
+        if not slugs:
+            return {}
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        oldest = {}
+        for chunk in _chunks(slugs):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"""SELECT collection_slug, floor_price FROM (
+                        SELECT collection_slug, floor_price,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY collection_slug ORDER BY recorded_at ASC, id ASC
+                               ) AS rn
+                        FROM price_history
+                        WHERE collection_slug IN ({placeholders})
+                        AND recorded_at >= datetime('now', ? || ' hours')
+                    ) ranked
+                    WHERE rn = 1""",
+                (*chunk, f"-{hours}")
+            )
+            oldest.update(dict(cursor.fetchall()))
         conn.close()
-        return result[0] if result else None
+        return oldest
 
     # ============== Percentage Alerts Methods ==============
 
@@ -633,6 +1134,7 @@ class Database:
                     (1 if is_recurring else 0, reference_price, row[0])
                 )
                 conn.commit()
+                self._notify_change("percent", slug)
                 return True
 
             cursor.execute(
@@ -643,6 +1145,7 @@ class Database:
                  1 if is_recurring else 0, reference_price)
             )
             conn.commit()
+            self._notify_change("percent", slug)
             return True
         except Exception as exc:
             if self._is_integrity_error(exc):
@@ -665,22 +1168,22 @@ class Database:
         conn.close()
         return results
 
-    def get_all_percentage_alerts(self) -> List[Tuple]:
-        """Get all active percentage alerts for checking"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
+    def get_all_percentage_alerts(self, collection_slugs: Optional[List[str]] = None) -> List[Tuple]:
+        """Get all active percentage alerts for checking, optionally only for some collections"""
+        return self._select_for_slugs(
             """SELECT user_id, collection_slug, percentage_threshold, direction, reference_price, is_recurring
-               FROM percentage_alerts WHERE is_active = 1"""
+               FROM percentage_alerts WHERE is_active = 1""",
+            collection_slugs
         )
-        results = cursor.fetchall()
-        conn.close()
-        return results
 
     def deactivate_percentage_alert(self, user_id: int, collection_slug: str, percentage: float,
-                                    direction: str, new_ref_price: Optional[float] = None):
-        """Mark a percentage alert as triggered. If recurring, update ref price."""
+                                    direction: str, new_ref_price: Optional[float] = None,
+                                    notification: Optional[Tuple[str, int, str]] = None):
+        """Mark a percentage alert as triggered. If recurring, update ref price.
+
+        ``notification`` (dedupe_key, user_id, message) is queued in the outbox
+        in the same transaction.
+        """
         conn = self._get_connection()
         cursor = conn.cursor()
 
@@ -706,8 +1209,11 @@ class Database:
                    WHERE user_id = ? AND collection_slug = ? AND percentage_threshold = ? AND direction = ?""",
                 (user_id, collection_slug.lower(), percentage, direction)
             )
+        if notification:
+            self._queue_notifications(cursor, [notification])
         conn.commit()
         conn.close()
+        self._notify_change("percent", collection_slug)
 
     def update_percentage_alert_ref_price(self, user_id: int, collection_slug: str,
                                           percentage: float, direction: str, new_ref_price: float):
@@ -722,6 +1228,7 @@ class Database:
         )
         conn.commit()
         conn.close()
+        self._notify_change("percent", collection_slug)
 
     # ============== Volume Alerts Methods ==============
 
@@ -738,6 +1245,7 @@ class Database:
                 (user_id, collection_slug.lower(), spike_multiplier)
             )
             conn.commit()
+            self._notify_change("volume", collection_slug)
             return True
         except Exception as exc:
             if self._is_integrity_error(exc):
@@ -760,21 +1268,17 @@ class Database:
         conn.close()
         return results
 
-    def get_all_volume_alerts(self) -> List[Tuple]:
-        """Get all active volume alerts for checking"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
+    def get_all_volume_alerts(self, collection_slugs: Optional[List[str]] = None) -> List[Tuple]:
+        """Get all active volume alerts for checking, optionally only for some collections"""
+        return self._select_for_slugs(
             """SELECT user_id, collection_slug, spike_multiplier, last_triggered_at
-               FROM volume_alerts WHERE is_active = 1"""
+               FROM volume_alerts WHERE is_active = 1""",
+            collection_slugs
         )
-        results = cursor.fetchall()
-        conn.close()
-        return results
 
-    def mark_volume_alert_triggered(self, user_id: int, collection_slug: str):
-        """Update volume alert trigger timestamp for cooldown checks."""
+    def mark_volume_alert_triggered(self, user_id: int, collection_slug: str,
+                                    notification: Optional[Tuple[str, int, str]] = None):
+        """Update volume alert trigger timestamp for cooldown checks, queueing ``notification``."""
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute(
@@ -782,23 +1286,81 @@ class Database:
                WHERE user_id = ? AND collection_slug = ? AND is_active = 1""",
             (user_id, collection_slug.lower())
         )
+        if notification:
+            self._queue_notifications(cursor, [notification])
         conn.commit()
         conn.close()
+        self._notify_change("volume", collection_slug)
 
     def get_average_volume(self, collection_slug: str, hours: int = 168) -> Optional[float]:
         """Get average volume over last N hours (default 7 days)"""
+        return self.get_average_volumes([collection_slug], hours).get(collection_slug.lower())
+
+    def get_average_volumes(self, collection_slugs: List[str], hours: int = 168) -> Dict[str, float]:
+        """Average 24h volume over the last N hours for many collections in one pass.
+
+        The default 7-day window is read from volume_rollup; other windows and
+        collections whose rollup went stale use one GROUP BY scan. Collections
+        without history (or with zero average) are left out.
+        """
+        slugs = list(dict.fromkeys(slug.lower() for slug in collection_slugs))
+        if not slugs:
+            return {}
         conn = self._get_connection()
         cursor = conn.cursor()
+        averages = {}
+        pending = slugs
+        if hours == VOLUME_ROLLUP_HOURS:
+            fresh = set()
+            for chunk in _chunks(slugs):
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(
+                    f"""SELECT collection_slug, volume_sum, sample_count FROM volume_rollup
+                        WHERE collection_slug IN ({placeholders})
+                        AND expired_through >= datetime('now', ? || ' hours')""",
+                    (*chunk, f"-{hours + _VOLUME_ROLLUP_SLACK_HOURS}")
+                )
+                for slug, volume_sum, sample_count in cursor.fetchall():
+                    fresh.add(slug)
+                    if sample_count > 0 and volume_sum > 0:
+                        averages[slug] = volume_sum / sample_count
+            pending = [slug for slug in slugs if slug not in fresh]
+
+        for chunk in _chunks(pending):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"""SELECT collection_slug, AVG(volume_24h) FROM price_history
+                    WHERE collection_slug IN ({placeholders})
+                    AND recorded_at >= datetime('now', ? || ' hours')
+                    GROUP BY collection_slug""",
+                (*chunk, f"-{hours}")
+            )
+            averages.update({slug: avg for slug, avg in cursor.fetchall() if avg})
+        conn.close()
+        return averages
 
-        cursor.execute(
-            """SELECT AVG(volume_24h) FROM price_history
-               WHERE collection_slug = ?
-               AND recorded_at >= datetime('now', ? || ' hours')""",
-            (collection_slug.lower(), f"-{hours}")
-        )
-        result = cursor.fetchone()
+    def get_volume_baselines(self, collection_slugs: List[str]) -> Dict[str, Tuple[float, float, int]]:
+        """(mean, standard deviation, sample_count) of the volume baseline per collection.
+
+        Collections without recorded history are left out.
+        """
+        slugs = list(dict.fromkeys(slug.lower() for slug in collection_slugs))
+        if not slugs:
+            return {}
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        baselines = {}
+        for chunk in _chunks(slugs):
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"""SELECT collection_slug, mean_volume, variance, sample_count FROM volume_baseline
+                    WHERE collection_slug IN ({placeholders})""",
+                chunk
+            )
+            for slug, mean, variance, count in cursor.fetchall():
+                baselines[slug] = (mean, max(variance, 0.0) ** 0.5, count)
         conn.close()
-        return result[0] if result and result[0] else None
+        return baselines
 
     # ============== Portfolio Methods ==============
 
@@ -877,6 +1439,7 @@ class Database:
                     (row[0],)
                 )
                 conn.commit()
+                self._notify_change("gas", None)
                 return True
 
             cursor.execute(
@@ -885,6 +1448,7 @@ class Database:
                 (user_id, target_gwei, alert_type)
             )
             conn.commit()
+            self._notify_change("gas", None)
             return True
         except Exception as exc:
             if self._is_integrity_error(exc):
@@ -920,8 +1484,9 @@ class Database:
         conn.close()
         return results
 
-    def deactivate_gas_alert(self, user_id: int, target_gwei: float, alert_type: str):
-        """Mark a gas alert as triggered"""
+    def deactivate_gas_alert(self, user_id: int, target_gwei: float, alert_type: str,
+                             notification: Optional[Tuple[str, int, str]] = None):
+        """Mark a gas alert as triggered, queueing ``notification``"""
         conn = self._get_connection()
         cursor = conn.cursor()
 
@@ -930,8 +1495,11 @@ class Database:
                WHERE user_id = ? AND target_gwei = ? AND alert_type = ?""",
             (user_id, target_gwei, alert_type)
         )
+        if notification:
+            self._queue_notifications(cursor, [notification])
         conn.commit()
         conn.close()
+        self._notify_change("gas", None)
 
     def get_all_monitored_collection_slugs(self) -> List[str]:
         """Get unique collection slugs that need history for watchlists, alerts, or portfolios."""
@@ -1011,6 +1579,110 @@ class Database:
         conn.close()
         return affected > 0
 
+    # ============== Collection Metadata Cache ==============
+
+    def get_collection_metadata(self, collection_slug: str) -> Optional[Tuple]:
+        """Get cached metadata as (payload_json, etag, last_modified, fetched_at)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT payload, etag, last_modified, fetched_at
+               FROM collection_metadata WHERE collection_slug = ?""",
+            (collection_slug,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        return row
+
+    def save_collection_metadata(self, collection_slug: str, payload: str,
+                                 etag: Optional[str], last_modified: Optional[str],
+                                 fetched_at: float):
+        """Insert or replace the cached metadata for a collection."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """INSERT INTO collection_metadata
+               (collection_slug, payload, etag, last_modified, fetched_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(collection_slug)
+               DO UPDATE SET payload = ?, etag = ?, last_modified = ?, fetched_at = ?""",
+            (collection_slug, payload, etag, last_modified, fetched_at,
+             payload, etag, last_modified, fetched_at)
+        )
+        conn.commit()
+        conn.close()
+
+    def touch_collection_metadata(self, collection_slug: str, etag: Optional[str],
+                                  last_modified: Optional[str], fetched_at: float):
+        """Mark cached metadata as revalidated (HTTP 304) without rewriting it."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """UPDATE collection_metadata
+               SET etag = ?, last_modified = ?, fetched_at = ?
+               WHERE collection_slug = ?""",
+            (etag, last_modified, fetched_at, collection_slug)
+        )
+        conn.commit()
+        conn.close()
+
+    # ============== Notification Outbox Methods ==============
+
+    def _queue_notifications(self, cursor, notifications: List[Tuple[str, int, str]]):
+        """Insert (dedupe_key, user_id, message) rows into the outbox on the caller's transaction."""
+        if notifications:
+            cursor.executemany(
+                """INSERT INTO notification_outbox (dedupe_key, user_id, message)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(dedupe_key) DO NOTHING""",
+                list(notifications)
+            )
+
+    def get_pending_notifications(self, after_id: int = 0, limit: int = 500) -> List[Tuple]:
+        """Oldest unsent notifications with id > ``after_id``: (id, user_id, message)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT id, user_id, message FROM notification_outbox
+               WHERE status = 'pending' AND id > ?
+               ORDER BY id LIMIT ?""",
+            (after_id, limit)
+        )
+        results = cursor.fetchall()
+        conn.close()
+        return results
+
+    def finish_notifications(self, sent_ids: List[int], failed_ids: List[int] = ()):
+        """Mark outbox rows as sent, or as failed when delivery is impossible."""
+        if not sent_ids and not failed_ids:
+            return
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        for status, ids in (("sent", sent_ids), ("failed", failed_ids)):
+            for chunk in _chunks(list(ids)):
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(
+                    f"""UPDATE notification_outbox SET status = ?, sent_at = CURRENT_TIMESTAMP
+                        WHERE id IN ({placeholders})""",
+                    (status, *chunk)
+                )
+        conn.commit()
+        conn.close()
+
+    def purge_notifications(self, days: int = 7) -> int:
+        """Delete finished outbox rows older than ``days``."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """DELETE FROM notification_outbox
+               WHERE status != 'pending' AND created_at < datetime('now', ? || ' hours')""",
+            (f"-{days * 24}",)
+        )
+        deleted = max(cursor.rowcount, 0)
+        conn.commit()
+        conn.close()
+        return deleted
+
     # ============== Mint Reminder Methods ==============
 
     def add_mint_reminder(self, user_id: int, nft_name: str, mint_price: str,
@@ -1107,5 +1779,38 @@ class Database:
         return affected > 0
 
 
-# Singleton instance
+class AsyncDatabase:
+    """Awaitable facade with the same method surface as Database.
+
+    Every public method runs on a worker thread, so handlers and jobs await
+    database I/O instead of blocking the event loop. SQLite gets a single
+    dedicated thread (it serializes writers anyway); Postgres gets one
+    thread per pooled connection.
+    """
+
+    def __init__(self, database: Database):
+        self._db = database
+        workers = max(1, DB_POOL_MAX_SIZE) if database.is_postgres else 1
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._db, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+
+        setattr(self, name, call)  # later lookups skip __getattr__
+        return call
+
+    def shutdown(self):
+        """Wait for queued database calls and stop the worker threads."""
+        self._executor.shutdown(wait=True)
+
+
+# Singleton instances
 db = Database()
+async_db = AsyncDatabase(db)
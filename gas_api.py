@@ -1,7 +1,8 @@
 import aiohttp
-import asyncio
 from typing import Optional, Dict, Any
 from config import ETHERSCAN_API_KEY
+from http_client import HttpClient
+from rate_limiter import get_bucket
 
 
 class GasAPI:
@@ -10,7 +11,19 @@ class GasAPI:
     def __init__(self):
         self.api_key = ETHERSCAN_API_KEY
         self.base_url = "https://api.etherscan.io/v2/api"
-        self.timeout = aiohttp.ClientTimeout(total=10, connect=5)
+        self.http = HttpClient(
+            "etherscan",
+            "Etherscan",
+            timeout=aiohttp.ClientTimeout(total=10, connect=5),
+            pool_limit=10,
+            pool_limit_per_host=4,
+            # Etherscan free tier: 5 calls/second per key.
+            limiter=get_bucket(
+                f"etherscan:{ETHERSCAN_API_KEY}", "etherscan",
+                rate=4, burst=5, min_rate=1, max_rate=5,
+            ),
+            http_error_format="HTTP error: {status}",
+        )
     
     async def get_gas_price(self) -> Optional[Dict[str, Any]]:
         """
@@ -22,28 +35,21 @@ class GasAPI:
         
         url = f"{self.base_url}?chainid=1&module=gastracker&action=gasoracle&apikey={self.api_key}"
         
+        data = await self.http.get_json(url)
+        if "error" in data:
+            return data
+        if data.get("status") != "1":
+            return {"error": data.get("message", "API error")}
+
+        result = data.get("result", {})
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("status") == "1":
-                            result = data.get("result", {})
-                            return {
-                                "low": float(result.get("SafeGasPrice", 0)),
-                                "average": float(result.get("ProposeGasPrice", 0)),
-                                "fast": float(result.get("FastGasPrice", 0)),
-                                "base_fee": float(result.get("suggestBaseFee", 0)),
-                            }
-                        else:
-                            return {"error": data.get("message", "API error")}
-                    else:
-                        return {"error": f"HTTP error: {response.status}"}
-        except asyncio.TimeoutError:
-            return {"error": "Request timeout - Etherscan API lambat, coba lagi"}
-        except aiohttp.ClientError as e:
-            return {"error": f"Connection error: {str(e)}"}
-        except Exception as e:
+            return {
+                "low": float(result.get("SafeGasPrice", 0)),
+                "average": float(result.get("ProposeGasPrice", 0)),
+                "fast": float(result.get("FastGasPrice", 0)),
+                "base_fee": float(result.get("suggestBaseFee", 0)),
+            }
+        except (TypeError, ValueError) as e:
             return {"error": f"Error: {str(e)}"}
     
     def format_gas_price(self, gas_data: Dict[str, Any]) -> str:
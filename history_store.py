@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: without numpy the store stays disabled
+    np = None
+
+from config import HISTORY_STORE_DIR, HISTORY_STORE_MAX_OPEN
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# One file per column, fixed-width little-endian values, one per sample.
+COLUMNS = (
+    ("ts", "<i8"),         # unix seconds (UTC), ascending
+    ("floor", "<f8"),
+    ("volume", "<f8"),     # rolling 24h volume at sample time
+    ("sales", "<i8"),
+    ("avg_price", "<f8"),
+)
+
+HistoryRow = Tuple[str, int, float, float, int, float]  # (slug, ts, floor, volume, sales, avg_price)
+
+
+def to_epoch(recorded_at) -> int:
+    """Unix seconds of a price_history.recorded_at value (UTC string or datetime)."""
+    if isinstance(recorded_at, datetime):
+        if recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+        return int(recorded_at.timestamp())
+    parsed = datetime.strptime(str(recorded_at)[:19], "%Y-%m-%d %H:%M:%S")
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def to_recorded_at(ts: float) -> str:
+    """Inverse of ``to_epoch``, in the format SQLite's CURRENT_TIMESTAMP uses."""
+    return datetime.fromtimestamp(int(ts), timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class HistoryStore:
+    """Append-only columnar copy of price_history, one directory per collection.
+
+    Columns are flat files read back as memory-mapped NumPy arrays, so a range
+    read is a binary search on ``ts`` plus zero-copy slices, with no SQL or
+    per-row Python objects. The database stays the source of truth:
+    ``catch_up()`` appends whatever the files miss (everything for a fresh
+    directory), and appends never go backwards in time, so replays are harmless.
+
+    A collection whose append fails (disk full, I/O error) is remembered and
+    caught up from the database by ``repair()`` before the next append.
+
+    Each mapped column holds a file descriptor, so only the ``max_open`` most
+    recently read collections stay mapped; an evicted map is closed once the
+    last view handed out from it is gone.
+    """
+
+    def __init__(self, root: str, max_open: int):
+        self.root = root
+        self.max_open = max(1, max_open)
+        self.enabled = np is not None
+        self._lock = threading.Lock()
+        # slug -> (length, mapped columns), least recently read first
+        self._maps: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._lengths: Dict[str, int] = {}  # known sample counts; only this process appends
+        self._failed: set = set()  # slugs whose last append failed
+        self._stats = {"appended": 0, "recovered": 0, "reads": 0, "evicted_maps": 0, "failed_appends": 0}
+
+    def _path(self, slug: str, column: str = "") -> str:
+        directory = os.path.join(self.root, re.sub(r"[^a-z0-9_-]", "_", slug.lower()))
+        return os.path.join(directory, f"{column}.bin") if column else directory
+
+    def _length(self, slug: str) -> int:
+        """Samples stored for ``slug``: the shortest column wins after an interrupted append."""
+        known = self._lengths.get(slug)
+        if known is not None:
+            return known
+        lengths = []
+        for column, dtype in COLUMNS:
+            try:
+                size = os.path.getsize(self._path(slug, column))
+            except OSError:
+                return 0
+            lengths.append(size // np.dtype(dtype).itemsize)
+        self._lengths[slug] = min(lengths)
+        return self._lengths[slug]
+
+    def _last_ts(self, slug: str, length: int) -> Optional[int]:
+        if not length:
+            return None
+        with open(self._path(slug, "ts"), "rb") as f:
+            f.seek((length - 1) * 8)
+            return int(np.frombuffer(f.read(8), dtype="<i8")[0])
+
+    # ---- Writes (blocking; call from a worker thread) ----
+
+    def append_many(self, rows: List[HistoryRow]) -> int:
+        """Append samples, skipping any not newer than a collection's last one."""
+        if not self.enabled or not rows:
+            return 0
+        by_slug: Dict[str, List[HistoryRow]] = {}
+        for row in rows:
+            by_slug.setdefault(row[0].lower(), []).append(row)
+
+        appended = 0
+        with self._lock:
+            for slug, samples in by_slug.items():
+                try:
+                    appended += self._append_slug(slug, samples)
+                except OSError as e:
+                    logger.error(f"History store append failed for {slug}, will catch up later: {e}")
+                    self._failed.add(slug)
+                    self._stats["failed_appends"] += 1
+        self._stats["appended"] += appended
+        return appended
+
+    def _append_slug(self, slug: str, samples: List[HistoryRow]) -> int:
+        os.makedirs(self._path(slug), exist_ok=True)
+        length = self._length(slug)
+        for column, dtype in COLUMNS:  # drop a partial tail left by a crash or failed write
+            path = self._path(slug, column)
+            if os.path.exists(path) and os.path.getsize(path) > length * np.dtype(dtype).itemsize:
+                os.truncate(path, length * np.dtype(dtype).itemsize)
+        last = self._last_ts(slug, length)
+        samples = sorted(samples, key=lambda sample: sample[1])
+        if last is not None:
+            samples = [sample for sample in samples if sample[1] > last]
+        if not samples:
+            return 0
+        for index, (column, dtype) in enumerate(COLUMNS, start=1):
+            with open(self._path(slug, column), "ab") as f:
+                f.write(np.array([sample[index] for sample in samples], dtype=dtype).tobytes())
+        self._maps.pop(slug, None)
+        self._lengths[slug] = length + len(samples)
+        return len(samples)
+
+    def catch_up(self, slugs: Optional[List[str]] = None) -> int:
+        """Append database history the files are missing; returns samples recovered.
+
+        Covers every collection with history unless ``slugs`` is given.
+        """
+        if not self.enabled:
+            return 0
+        recovered = 0
+        for slug in db.get_history_slugs() if slugs is None else slugs:
+            with self._lock:
+                last = self._last_ts(slug, self._length(slug))
+            since = to_recorded_at(last) if last is not None else None
+            rows = db.get_price_history_since(slug, since)
+            recovered += self.append_many([
+                (slug, to_epoch(recorded_at), floor or 0, volume or 0, sales or 0, avg_price or 0)
+                for recorded_at, floor, volume, sales, avg_price in rows
+            ])
+        self._stats["recovered"] += recovered
+        return recovered
+
+    def repair(self) -> int:
+        """Catch up collections whose last append failed; returns samples recovered."""
+        with self._lock:
+            failed, self._failed = sorted(self._failed), set()
+        return self.catch_up(failed) if failed else 0
+
+    async def repair_async(self) -> int:
+        return await asyncio.to_thread(self.repair)
+
+    async def append_async(self, rows: List[HistoryRow]) -> int:
+        return await asyncio.to_thread(self.append_many, rows)
+
+    async def catch_up_async(self) -> int:
+        return await asyncio.to_thread(self.catch_up)
+
+    # ---- Reads ----
+
+    def _pread(self, slug: str, column: str, dtype: str, start: int, count: int):
+        """``count`` values of a column from sample ``start`` (os.pread: cheaper than np.fromfile)."""
+        itemsize = np.dtype(dtype).itemsize
+        fd = os.open(self._path(slug, column), os.O_RDONLY)
+        try:
+            return np.frombuffer(os.pread(fd, count * itemsize, start * itemsize), dtype=dtype)
+        finally:
+            os.close(fd)
+
+    def read(self, slug: str, since: Optional[float] = None,
+             until: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Columns of ``slug`` with since <= ts <= until, as read-only array views.
+
+        Returns None when the store is disabled.
+        """
+        if not self.enabled:
+            return None
+        slug = slug.lower()
+        with self._lock:
+            length = self._length(slug)
+            cached = self._maps.get(slug)
+            if cached is None or cached[0] != length:
+                if length:
+                    # Plain ndarray views over the maps: slicing them stays zero-copy
+                    # without np.memmap's per-slice overhead.
+                    columns = {
+                        column: np.asarray(
+                            np.memmap(self._path(slug, column), dtype=dtype, mode="r", shape=(length,))
+                        )
+                        for column, dtype in COLUMNS
+                    }
+                else:
+                    columns = {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS}
+                cached = (length, columns)
+                self._maps[slug] = cached
+                while len(self._maps) > self.max_open:
+                    self._maps.popitem(last=False)
+                    self._stats["evicted_maps"] += 1
+            self._maps.move_to_end(slug)
+        self._stats["reads"] += 1
+        columns = cached[1]
+        ts = columns["ts"]
+        start = 0 if since is None else int(np.searchsorted(ts, since, side="left"))
+        end = len(ts) if until is None else int(np.searchsorted(ts, until, side="right"))
+        return {column: values[start:end] for column, values in columns.items()}
+
+    def read_recent(self, slugs: List[str], since: float,
+                    until: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Columns with since <= ts <= until for many collections, read straight from the files.
+
+        For batch jobs such as analytics: only the tail of each column is
+        read (growing it until it reaches back to ``since``), and nothing is
+        mapped, so the read-side LRU is neither used nor churned.
+        Collections without samples in the range are left out.
+        """
+        if not self.enabled:
+            return {}
+        with self._lock:
+            lengths = {slug: self._length(slug.lower()) for slug in slugs}
+        results = {}
+        for slug, length in lengths.items():
+            if not length:
+                continue
+            slug = slug.lower()
+            count = min(length, 256)
+            while True:
+                offset = length - count
+                ts = self._pread(slug, "ts", "<i8", offset, count)
+                if count == length or ts[0] < since:
+                    break
+                count = min(length, count * 2)
+            start = int(np.searchsorted(ts, since, side="left"))
+            end = len(ts) if until is None else int(np.searchsorted(ts, until, side="right"))
+            if start >= end:
+                continue
+            columns = {"ts": ts[start:end]}
+            for column, dtype in COLUMNS[1:]:
+                columns[column] = self._pread(slug, column, dtype, offset + start, end - start)
+            results[slug] = columns
+        self._stats["reads"] += len(results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "open_maps": len(self._maps),
+            "pending_repairs": len(self._failed),
+            **self._stats,
+        }
+
+
+# Singleton instance, appended to by record_price_history
+history_store = HistoryStore(HISTORY_STORE_DIR, max_open=HISTORY_STORE_MAX_OPEN)
@@ -0,0 +1,267 @@
+import aiohttp
+import asyncio
+import time
+from typing import Optional, Dict, Any, List
+from rate_limiter import Priority, TokenBucket, current_priority, parse_retry_after
+
+# Upper bounds (ms) of the per-upstream latency histogram buckets.
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Statuses worth retrying: the upstream is briefly unavailable, not rejecting us.
+RETRYABLE_STATUSES = (500, 502, 503, 504)
+
+# A user command fails fast with the 429 error instead of sitting out a
+# Retry-After pause longer than this; it is never retried after a 429.
+INTERACTIVE_MAX_PAUSE = 5.0  # seconds
+
+
+class HttpClient:
+    """Pooled JSON-over-HTTP client for one upstream (OpenSea, Etherscan, CoinGecko).
+
+    Owns a long-lived keep-alive session, the timeout and retry policy, JSON
+    decoding and the mapping of failures to the ``{"error": ...}`` dicts the
+    bot already understands, plus latency / in-flight stats for /metrics.
+    """
+
+    def __init__(self, name: str, label: str,
+                 headers: Optional[Dict[str, str]] = None,
+                 timeout: Optional[aiohttp.ClientTimeout] = None,
+                 pool_limit: int = 100,
+                 pool_limit_per_host: int = 10,
+                 keepalive_timeout: float = 60,
+                 dns_cache_ttl: int = 300,
+                 retries: int = 1,
+                 retry_backoff: float = 0.5,
+                 limiter: Optional[TokenBucket] = None,
+                 rate_limit_retries: int = 3,
+                 status_errors: Optional[Dict[int, str]] = None,
+                 http_error_format: str = "API error: {status}"):
+        self.name = name
+        self.label = label
+        self.headers = headers or {}
+        self.timeout = timeout or aiohttp.ClientTimeout(total=10, connect=5)
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.limiter = limiter
+        self.rate_limit_retries = rate_limit_retries
+        self.status_errors = status_errors or {}
+        self.http_error_format = http_error_format
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "not_modified": 0,
+            "in_flight": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+        }
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._latency_sum_ms = 0.0
+        _clients.append(self)
+
+    # ---- Session lifecycle ----
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Count new vs reused pool connections."""
+        trace = aiohttp.TraceConfig()
+
+        async def on_create(session, ctx, params):
+            self._stats["connections_created"] += 1
+
+        async def on_reuse(session, ctx, params):
+            self._stats["connections_reused"] += 1
+
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+    async def start(self):
+        """Open the shared session with a tuned keep-alive connection pool."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        self._session = aiohttp.ClientSession(
+            timeout=self.timeout,
+            headers=self.headers,
+            connector=connector,
+            trace_configs=[self._trace_config()],
+        )
+
+    async def close(self):
+        """Close the shared session and its pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Lazily (re)open so callers outside the bot lifecycle still work.
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    # ---- Requests ----
+
+    def _record_latency(self, elapsed_ms: float):
+        self._latency_sum_ms += elapsed_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self._latency_buckets[i] += 1
+                return
+        self._latency_buckets[-1] += 1
+
+    def _status_error(self, status: int) -> Dict[str, Any]:
+        message = self.status_errors.get(status) or self.http_error_format.format(status=status)
+        return {"error": message}
+
+    async def _request_once(self, url: str, headers: Optional[Dict[str, str]]):
+        """One attempt. Returns (result, HTTP status, response headers)."""
+        if self.limiter is not None:
+            if (current_priority() == Priority.INTERACTIVE
+                    and self.limiter.blocked_for() > INTERACTIVE_MAX_PAUSE):
+                self._stats["rate_limited"] += 1
+                return self._status_error(429), 429, None
+            await self.limiter.acquire()
+        session = await self._get_session()
+        async with session.get(url, headers=headers) as response:
+            if response.status == 429:
+                self._stats["rate_limited"] += 1
+                if self.limiter is not None:
+                    self.limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+                return self._status_error(429), 429, response.headers
+            if self.limiter is not None:
+                self.limiter.on_success()
+            if response.status == 304:
+                return {}, 304, response.headers
+            if response.status != 200:
+                return self._status_error(response.status), response.status, response.headers
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return {"error": f"Invalid response dari {self.label} API"}, response.status, response.headers
+            return data, response.status, response.headers
+
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None):
+        """GET with retries. Returns (result, HTTP status or None, response headers or None)."""
+        self._stats["requests"] += 1
+        self._stats["in_flight"] += 1
+        started = time.monotonic()
+        try:
+            attempt = 0
+            limited = 0
+            while True:
+                response_headers = None
+                try:
+                    result, status, response_headers = await self._request_once(url, headers)
+                    retryable = status in RETRYABLE_STATUSES
+                except asyncio.TimeoutError:
+                    result, status, retryable = {"error": f"Request timeout - {self.label} API lambat, coba lagi"}, None, True
+                except aiohttp.ClientError as e:
+                    result, status, retryable = {"error": f"Connection error: {str(e)}"}, None, True
+
+                if status == 429 and self.limiter is not None:
+                    # Background requests are retried once the limiter's Retry-After
+                    # pause has passed, so a 429 no longer silently skips this
+                    # collection for the cycle. Users get the error right away.
+                    if limited >= self.rate_limit_retries or current_priority() == Priority.INTERACTIVE:
+                        break
+                    limited += 1
+                    self._stats["retries"] += 1
+                    continue
+
+                if not retryable or attempt >= self.retries:
+                    break
+                attempt += 1
+                self._stats["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+            if "error" in result:
+                self._stats["errors"] += 1
+            elif status == 304:
+                self._stats["not_modified"] += 1
+            return result, status, response_headers
+        finally:
+            self._stats["in_flight"] -= 1
+            self._record_latency((time.monotonic() - started) * 1000)
+
+    async def get_json(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """GET ``url`` and decode JSON. Failures come back as ``{"error": ...}``."""
+        result, _, _ = await self._fetch(url, headers)
+        return result
+
+    async def get_json_conditional(self, url: str, etag: Optional[str] = None,
+                                   last_modified: Optional[str] = None):
+        """Conditional GET revalidating a cached copy by ETag / Last-Modified.
+
+        Returns ``(result, validators)``: ``result`` is None when the server
+        answered 304 Not Modified, and ``validators`` holds the ``etag`` and
+        ``last_modified`` to send next time.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        result, status, response_headers = await self._fetch(url, headers or None)
+        validators = {"etag": etag, "last_modified": last_modified}
+        if response_headers is not None and "error" not in result:
+            validators = {
+                "etag": response_headers.get("ETag") or etag,
+                "last_modified": response_headers.get("Last-Modified") or last_modified,
+            }
+        if status == 304:
+            return None, validators
+        return result, validators
+
+    # ---- Stats ----
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, connection reuse ratio and latency histogram for this upstream."""
+        created = self._stats["connections_created"]
+        reused = self._stats["connections_reused"]
+        total = created + reused
+        histogram = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self._latency_buckets)}
+        histogram["le_inf"] = self._latency_buckets[-1]
+        count = sum(self._latency_buckets)
+        return {
+            **self._stats,
+            "reuse_ratio": round(reused / total, 4) if total else 0.0,
+            "latency_ms": {
+                "count": count,
+                "avg": round(self._latency_sum_ms / count, 1) if count else 0.0,
+                "buckets": histogram,
+            },
+        }
+
+
+_clients: List[HttpClient] = []
+
+
+async def start_all():
+    """Open the pooled session of every upstream client."""
+    for client in _clients:
+        await client.start()
+
+
+async def close_all():
+    """Close every upstream client session."""
+    for client in _clients:
+        await client.close()
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-upstream stats keyed by client name."""
+    return {client.name: client.stats() for client in _clients}
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from config import MARKET_SNAPSHOT_CONCURRENCY
+from gas_api import gas_api
+from opensea_api import opensea_api
+from rate_limiter import Priority, request_priority
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Read-only market data for one alert tick, shared by every evaluator.
+
+    Only collections whose fetch succeeded are present; evaluators skip the
+    rest exactly as they used to skip failed requests.
+    """
+    taken_at: float
+    stats: Mapping[str, Dict[str, Any]] = field(default_factory=dict)
+    offers: Mapping[str, Dict[str, Any]] = field(default_factory=dict)
+    gas: Optional[Dict[str, Any]] = None  # gas oracle reading, None if not fetched or failed
+
+    def floor(self, slug: str) -> Optional[Tuple[float, str]]:
+        """(floor price, symbol) or None."""
+        stats = self.stats.get(slug)
+        if not stats:
+            return None
+        total = stats.get("total", {})
+        floor = total.get("floor_price")
+        if floor is None:
+            return None
+        return floor, total.get("floor_price_symbol", "ETH")
+
+    def top_offer(self, slug: str) -> Optional[Tuple[float, str]]:
+        """(best collection offer, symbol) or None."""
+        offer = self.offers.get(slug)
+        if not offer:
+            return None
+        return offer.get("value"), offer.get("symbol", "WETH")
+
+    def price(self, slug: str, basis: str) -> Optional[Tuple[float, str]]:
+        return self.top_offer(slug) if basis == "top_offer" else self.floor(slug)
+
+    def one_day(self, slug: str) -> Optional[Dict[str, Any]]:
+        """The 24h interval (volume, sales, average_price), {} if absent, None if not fetched."""
+        stats = self.stats.get(slug)
+        if not stats:
+            return None
+        for interval in stats.get("intervals", []):
+            if interval.get("interval") == "one_day":
+                return interval
+        return {}
+
+
+async def _fetch_stats(slug: str, limit: asyncio.Semaphore) -> Optional[Dict[str, Any]]:
+    try:
+        async with limit:
+            stats = await opensea_api.get_collection_stats(slug)
+    except Exception as e:
+        logger.error(f"Snapshot stats fetch failed for {slug}: {e}")
+        return None
+    return stats if stats and "error" not in stats else None
+
+
+async def _fetch_offer(slug: str, limit: asyncio.Semaphore) -> Optional[Dict[str, Any]]:
+    try:
+        async with limit:
+            offer = await opensea_api.get_top_collection_offer(slug)
+    except Exception as e:
+        logger.error(f"Snapshot offer fetch failed for {slug}: {e}")
+        return None
+    return offer if offer and "error" not in offer else None
+
+
+async def _fetch_gas() -> Optional[Dict[str, Any]]:
+    try:
+        gas = await gas_api.get_gas_price()
+    except Exception as e:
+        logger.error(f"Snapshot gas fetch failed: {e}")
+        return None
+    return gas if gas and "error" not in gas else None
+
+
+async def take_snapshot(slugs: Iterable[str], offer_slugs: Iterable[str] = (),
+                        include_gas: bool = False) -> MarketSnapshot:
+    """Fetch stats for every distinct slug and top offers for ``offer_slugs``, once each.
+
+    Requests go out at the caller's priority. With ``include_gas`` the gas
+    oracle is read alongside.
+    """
+    stats_slugs = list(dict.fromkeys(slugs))
+    offer_list = list(dict.fromkeys(offer_slugs))
+
+    # Bounded fan-out; tasks inherit the priority that is current when they are created.
+    limit = asyncio.Semaphore(max(1, MARKET_SNAPSHOT_CONCURRENCY))
+    gas_task = asyncio.ensure_future(_fetch_gas()) if include_gas else None
+    stats_tasks = [asyncio.ensure_future(_fetch_stats(slug, limit)) for slug in stats_slugs]
+    offer_tasks = [asyncio.ensure_future(_fetch_offer(slug, limit)) for slug in offer_list]
+
+    stats = await asyncio.gather(*stats_tasks)
+    offers = await asyncio.gather(*offer_tasks)
+    gas = await gas_task if gas_task is not None else None
+    return MarketSnapshot(
+        taken_at=time.time(),
+        stats=MappingProxyType({
+            slug: data for slug, data in zip(stats_slugs, stats) if data is not None
+        }),
+        offers=MappingProxyType({
+            slug: data for slug, data in zip(offer_list, offers) if data is not None
+        }),
+        gas=gas,
+    )
+
+
+async def take_history_snapshot(slugs: Iterable[str], known: MarketSnapshot) -> MarketSnapshot:
+    """Stats for ``slugs`` for a price history sample, fetched at HISTORY priority.
+
+    Collections already in ``known`` (the alert tick's snapshot) are reused
+    instead of fetched again.
+    """
+    slugs = list(dict.fromkeys(slugs))
+    missing = [slug for slug in slugs if slug not in known.stats]
+    with request_priority(Priority.HISTORY):
+        fetched = await take_snapshot(missing)
+    stats = {slug: known.stats[slug] for slug in slugs if slug in known.stats}
+    stats.update(fetched.stats)
+    return MarketSnapshot(taken_at=fetched.taken_at, stats=MappingProxyType(stats))
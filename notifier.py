@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from config import (
+    NOTIFY_RATE_LIMIT,
+    NOTIFY_PER_CHAT_INTERVAL,
+    NOTIFY_WORKERS,
+    NOTIFY_MAX_ATTEMPTS,
+)
+from rate_limiter import Priority, get_bucket
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the enqueue-to-delivery latency histogram buckets.
+DELIVERY_BUCKETS_S = (1, 5, 15, 60, 300)
+
+
+@dataclass
+class _Notification:
+    chat_id: int
+    text: str
+    options: Dict[str, Any]
+    dedupe_key: Optional[Hashable]
+    on_result: Optional[Callable[[bool], None]] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+    not_before: Optional[float] = None  # reserved per-chat send slot (monotonic)
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    # int by default, a timedelta when PTB's timedelta mode is enabled
+    retry_after = error.retry_after
+    if hasattr(retry_after, "total_seconds"):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class Notifier:
+    """Outbound Telegram message queue drained by a pool of worker tasks.
+
+    Alert jobs enqueue messages and move on, so evaluation never waits on
+    delivery. Workers pace sends through a bot-wide token bucket (Telegram
+    allows about 30 messages/second) and keep at least
+    ``NOTIFY_PER_CHAT_INTERVAL`` between messages to the same chat (a message
+    that has to wait for its chat is set aside, not slept on). A
+    ``RetryAfter`` reschedules the message once the flood wait has passed
+    and holds back that chat; network errors are retried with backoff.
+    A message Telegram cannot parse as Markdown (e.g. a digest where one
+    alert has a stray ``_``) is resent once as plain text rather than lost.
+    """
+
+    def __init__(self, rate: float, per_chat_interval: float, workers: int, max_attempts: int):
+        self.per_chat_interval = per_chat_interval
+        self.worker_count = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.bucket = get_bucket(
+            "telegram", "telegram",
+            rate=rate, burst=max(1, int(rate)), min_rate=1.0, max_rate=rate,
+        )
+
+        self._bot = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._scheduled: Dict[int, asyncio.TimerHandle] = {}  # retries waiting to be re-queued
+        self._chat_next_send: Dict[int, float] = {}
+        self._pending_keys: set = set()
+        self._stats = {
+            "enqueued": 0, "sent": 0, "failed": 0, "retried": 0,
+            "flood_waits": 0, "duplicates": 0, "plain_text_fallbacks": 0,
+        }
+        self._latency_buckets = [0] * (len(DELIVERY_BUCKETS_S) + 1)
+        self._latency_sum = 0.0
+        self._send_ms_sum = 0.0
+
+    # ---- Lifecycle ----
+
+    def start(self, bot):
+        """Start the worker tasks on the running loop."""
+        if self._workers:
+            return
+        self._bot = bot
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Give queued and parked messages up to ``timeout`` seconds to go out, then stop the workers."""
+        if not self._workers:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                await asyncio.wait_for(self._queue.join(), max(0.0, deadline - time.monotonic()))
+                if not self._scheduled or time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(0.1)
+        except asyncio.TimeoutError:
+            pass
+        for handle in self._scheduled.values():
+            handle.cancel()
+        undelivered = self._queue.qsize() + len(self._scheduled)
+        if undelivered:
+            logger.warning(f"Notifier stopped with {undelivered} undelivered messages")
+        self._scheduled.clear()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---- Producer side ----
+
+    def enqueue(self, chat_id: int, text: str, dedupe_key: Optional[Hashable] = None,
+                on_result: Optional[Callable[[bool], None]] = None,
+                parse_mode: Optional[str] = ParseMode.MARKDOWN, **options) -> bool:
+        """Queue a message for ``chat_id``; returns False if ``dedupe_key`` is already pending.
+
+        ``on_result(delivered)`` is called once the message is sent or given
+        up on. Extra keyword arguments are passed through to ``bot.send_message``.
+        """
+        if self._queue is None:
+            raise RuntimeError("Notifier is not started")
+        if dedupe_key is not None:
+            if dedupe_key in self._pending_keys:
+                self._stats["duplicates"] += 1
+                return False
+            self._pending_keys.add(dedupe_key)
+        options["parse_mode"] = parse_mode
+        self._queue.put_nowait(_Notification(chat_id, text, options, dedupe_key, on_result))
+        self._stats["enqueued"] += 1
+        return True
+
+    # ---- Workers ----
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._deliver(item)
+            except Exception as e:
+                logger.error(f"Notifier worker error for chat {item.chat_id}: {e}")
+                self._finish(item, False)
+            finally:
+                self._queue.task_done()
+
+    def _reserve_chat_slot(self, item: _Notification):
+        """Give the message the chat's next send slot, in arrival order."""
+        now = time.monotonic()
+        item.not_before = max(now, self._chat_next_send.get(item.chat_id, 0.0))
+        self._chat_next_send[item.chat_id] = item.not_before + self.per_chat_interval
+
+    async def _deliver(self, item: _Notification):
+        if item.not_before is None:
+            self._reserve_chat_slot(item)
+        wait = item.not_before - time.monotonic()
+        if wait > 0:
+            # Park the message rather than the worker, so several messages for
+            # one chat (e.g. a split digest) never hold up every other chat.
+            self._requeue_later(item, wait)
+            return
+        await self.bucket.acquire(Priority.ALERT)
+        item.attempts += 1
+        started = time.monotonic()
+        try:
+            await self._bot.send_message(chat_id=item.chat_id, text=item.text, **item.options)
+        except RetryAfter as e:
+            wait = _retry_after_seconds(e)
+            self._stats["flood_waits"] += 1
+            # Hold back this chat for the whole flood wait; the shared rate is
+            # cut (without pausing other chats) in case the limit was bot-wide.
+            self._chat_next_send[item.chat_id] = time.monotonic() + wait
+            self.bucket.on_rate_limited(0)
+            self._reschedule(item, wait, count_attempt=False)
+            return
+        except BadRequest as e:
+            if item.options.get("parse_mode") and "can't parse entities" in str(e).lower():
+                logger.warning(f"Markup rejected for chat {item.chat_id}, resending as plain text: {e}")
+                item.options["parse_mode"] = None
+                self._stats["plain_text_fallbacks"] += 1
+                self._reschedule(item, 0, count_attempt=False)
+                return
+            logger.error(f"Failed to send message to chat {item.chat_id}: {e}")
+            self._stats["failed"] += 1
+            self._finish(item, False)
+            return
+        except NetworkError as e:
+            if item.attempts < self.max_attempts:
+                self._reschedule(item, min(60.0, 2.0 ** item.attempts))
+            else:
+                logger.error(f"Giving up on message to chat {item.chat_id} after {item.attempts} attempts: {e}")
+                self._stats["failed"] += 1
+                self._finish(item, False)
+            return
+        except Exception as e:
+            # Blocked by the user, chat not found, bad markup: retrying won't help.
+            logger.error(f"Failed to send message to chat {item.chat_id}: {e}")
+            self._stats["failed"] += 1
+            self._finish(item, False)
+            return
+
+        finished = time.monotonic()
+        self.bucket.on_success()
+        self._stats["sent"] += 1
+        self._send_ms_sum += (finished - started) * 1000
+        self._record_latency(finished - item.enqueued_at)
+        self._finish(item, True)
+
+    def _reschedule(self, item: _Notification, delay: float, count_attempt: bool = True):
+        if not count_attempt:
+            item.attempts -= 1
+        self._stats["retried"] += 1
+        item.not_before = None  # takes a fresh chat slot when it comes back
+        self._requeue_later(item, delay)
+
+    def _requeue_later(self, item: _Notification, delay: float):
+        handle_id = id(item)
+        loop = asyncio.get_running_loop()
+
+        def requeue():
+            self._scheduled.pop(handle_id, None)
+            self._queue.put_nowait(item)
+
+        self._scheduled[handle_id] = loop.call_later(delay, requeue)
+
+    def _finish(self, item: _Notification, delivered: bool):
+        if item.dedupe_key is not None:
+            self._pending_keys.discard(item.dedupe_key)
+        if item.on_result is not None:
+            try:
+                item.on_result(delivered)
+            except Exception as e:
+                logger.error(f"Notification result callback failed: {e}")
+        if len(self._chat_next_send) > 10000:
+            now = time.monotonic()
+            self._chat_next_send = {
+                chat_id: at for chat_id, at in self._chat_next_send.items() if at > now
+            }
+
+    # ---- Metrics ----
+
+    def _record_latency(self, elapsed: float):
+        self._latency_sum += elapsed
+        for i, bound in enumerate(DELIVERY_BUCKETS_S):
+            if elapsed <= bound:
+                self._latency_buckets[i] += 1
+                return
+        self._latency_buckets[-1] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        histogram = {f"le_{bound}s": count for bound, count in zip(DELIVERY_BUCKETS_S, self._latency_buckets)}
+        histogram["le_inf"] = self._latency_buckets[-1]
+        sent = self._stats["sent"]
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "scheduled_retries": len(self._scheduled),
+            "workers": len(self._workers),
+            "send_ms_avg": round(self._send_ms_sum / sent, 1) if sent else 0.0,
+            "delivery_latency_s": {
+                "count": sent,
+                "avg": round(self._latency_sum / sent, 2) if sent else 0.0,
+                "buckets": histogram,
+            },
+        }
+
+
+# Singleton instance, started in post_init
+notifier = Notifier(
+    rate=NOTIFY_RATE_LIMIT,
+    per_chat_interval=NOTIFY_PER_CHAT_INTERVAL,
+    workers=NOTIFY_WORKERS,
+    max_attempts=NOTIFY_MAX_ATTEMPTS,
+)
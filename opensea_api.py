@@ -1,9 +1,33 @@
 import aiohttp
 import asyncio
+import json
+import time
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 from urllib.parse import quote
-from config import OPENSEA_API_KEY, OPENSEA_API_BASE_URL
+from config import (
+    OPENSEA_API_KEY,
+    OPENSEA_API_BASE_URL,
+    OPENSEA_POOL_LIMIT,
+    OPENSEA_POOL_LIMIT_PER_HOST,
+    OPENSEA_KEEPALIVE_TIMEOUT,
+    OPENSEA_DNS_CACHE_TTL,
+    OPENSEA_RATE_LIMIT,
+    OPENSEA_RATE_BURST,
+    OPENSEA_RATE_MIN,
+    OPENSEA_RATE_MAX,
+    STATS_CACHE_TTL,
+    STATS_CACHE_SIZE,
+    OVERVIEW_FRESH_TTL,
+    OVERVIEW_SOFT_TTL,
+    OVERVIEW_CACHE_SIZE,
+    METADATA_CACHE_TTL,
+    METADATA_CACHE_SIZE,
+)
+from cache import TTLCache
+from database import async_db
+from http_client import HttpClient
+from rate_limiter import get_bucket
 
 
 class OpenSeaAPI:
@@ -17,41 +41,88 @@ class OpenSeaAPI:
         if OPENSEA_API_KEY:
             self.headers["X-API-KEY"] = OPENSEA_API_KEY
         
-        # Timeout settings for faster response
-        self.timeout = aiohttp.ClientTimeout(total=10, connect=5)
-    
-    async def _make_request(self, url: str, session: aiohttp.ClientSession) -> Optional[Dict[str, Any]]:
+        self.http = HttpClient(
+            "opensea",
+            "OpenSea",
+            headers=self.headers,
+            # Timeout settings for faster response
+            timeout=aiohttp.ClientTimeout(total=10, connect=5),
+            pool_limit=OPENSEA_POOL_LIMIT,
+            pool_limit_per_host=OPENSEA_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=OPENSEA_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=OPENSEA_DNS_CACHE_TTL,
+            # OpenSea rate limits are per API key, so every request made with
+            # the same key (jobs and commands alike) shares one bucket.
+            limiter=get_bucket(
+                f"opensea:{OPENSEA_API_KEY}",
+                "opensea",
+                rate=OPENSEA_RATE_LIMIT,
+                burst=OPENSEA_RATE_BURST,
+                min_rate=OPENSEA_RATE_MIN,
+                max_rate=OPENSEA_RATE_MAX,
+            ),
+            status_errors={
+                401: "Unauthorized - API key tidak valid atau tidak ada",
+                404: "Collection not found",
+                429: "Rate limit exceeded. Please try again later.",
+            },
+        )
+
+        self.stats_cache = TTLCache("collection_stats", ttl=STATS_CACHE_TTL, maxsize=STATS_CACHE_SIZE)
+        self.overview_cache = TTLCache("collection_overview", ttl=OVERVIEW_SOFT_TTL, maxsize=OVERVIEW_CACHE_SIZE)
+        self.metadata_cache = TTLCache("collection_metadata", ttl=METADATA_CACHE_TTL, maxsize=METADATA_CACHE_SIZE)
+
+    async def _make_request(self, url: str) -> Optional[Dict[str, Any]]:
         """Make a single API request with error handling"""
-        try:
-            async with session.get(url, headers=self.headers) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 401:
-                    return {"error": "Unauthorized - API key tidak valid atau tidak ada"}
-                elif response.status == 404:
-                    return {"error": "Collection not found"}
-                elif response.status == 429:
-                    return {"error": "Rate limit exceeded. Please try again later."}
-                else:
-                    return {"error": f"API error: {response.status}"}
-        except asyncio.TimeoutError:
-            return {"error": "Request timeout - OpenSea API lambat, coba lagi"}
-        except aiohttp.ClientError as e:
-            return {"error": f"Connection error: {str(e)}"}
+        return await self.http.get_json(url)
     
     async def get_collection_stats(self, collection_slug: str) -> Optional[Dict[str, Any]]:
-        """Get collection statistics including floor price"""
+        """Get collection statistics including floor price.
+
+        Served from a short-TTL cache; concurrent misses share one request and
+        errors are never cached.
+        """
         url = f"{self.base_url}/collections/{collection_slug}/stats"
-        
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            return await self._make_request(url, session)
+        return await self.stats_cache.get_or_load(
+            collection_slug,
+            lambda: self._make_request(url),
+            cacheable=lambda stats: "error" not in stats,
+        )
     
     async def get_collection_info(self, collection_slug: str) -> Optional[Dict[str, Any]]:
-        """Get collection information"""
-        url = f"{self.base_url}/collections/{collection_slug}"
+        """Get collection information (name, chain, links, contracts).
 
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            return await self._make_request(url, session)
+        Served from a long-TTL cache persisted in the database, so restarts do
+        not refetch it. Expired entries are revalidated with a conditional
+        request and kept (stale) if OpenSea is unavailable.
+        """
+        return await self.metadata_cache.get_or_load(
+            collection_slug,
+            lambda: self._load_collection_info(collection_slug),
+            cacheable=lambda info: "error" not in info,
+        )
+
+    async def _load_collection_info(self, collection_slug: str) -> Dict[str, Any]:
+        url = f"{self.base_url}/collections/{quote(collection_slug, safe='')}"
+        cached, etag, last_modified = None, None, None
+        row = await async_db.get_collection_metadata(collection_slug)
+        if row:
+            payload, etag, last_modified, fetched_at = row
+            cached = json.loads(payload)
+            if time.time() - fetched_at < METADATA_CACHE_TTL:
+                return cached
+
+        info, validators = await self.http.get_json_conditional(url, etag, last_modified)
+        now = time.time()
+        if info is None:  # 304 Not Modified
+            await async_db.touch_collection_metadata(collection_slug, validators["etag"], validators["last_modified"], now)
+            return cached
+        if "error" in info:
+            return cached if cached is not None else info
+        await async_db.save_collection_metadata(
+            collection_slug, json.dumps(info), validators["etag"], validators["last_modified"], now
+        )
+        return info
 
     async def get_recent_sales(self, collection_slug: str, limit: int = 5) -> Optional[Dict[str, Any]]:
         """Get recent sale events for a collection."""
@@ -61,28 +132,42 @@ class OpenSeaAPI:
             f"{self.base_url}/events/collection/{safe_slug}"
             f"?event_type=sale&limit={safe_limit}"
         )
-
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            return await self._make_request(url, session)
+        return await self._make_request(url)
 
     async def get_collection_overview(self, collection_slug: str, sales_limit: int = 5):
         """Get stats, info, and recent sales in parallel for the richer Telegram UI."""
         safe_slug = quote(collection_slug, safe="")
-        stats_url = f"{self.base_url}/collections/{safe_slug}/stats"
-        info_url = f"{self.base_url}/collections/{safe_slug}"
         sales_url = (
             f"{self.base_url}/events/collection/{safe_slug}"
             f"?event_type=sale&limit={max(1, min(sales_limit, 10))}"
         )
 
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            stats_task = self._make_request(stats_url, session)
-            info_task = self._make_request(info_url, session)
-            sales_task = self._make_request(sales_url, session)
+        stats, info, sales = await asyncio.gather(
+            self.get_collection_stats(collection_slug),
+            self.get_collection_info(collection_slug),
+            self._make_request(sales_url),
+        )
+        return stats, info, sales
+
+    def has_cached_overview(self, collection_slug: str) -> bool:
+        """True when get_collection_overview_swr can answer without waiting."""
+        return self.overview_cache.get_with_age(collection_slug) is not None
+
+    async def get_collection_overview_swr(self, collection_slug: str):
+        """Stale-while-revalidate wrapper around get_collection_overview.
+
+        Returns ``((stats, info, sales), refresh)``. ``refresh`` is None when the
+        overview was fetched now or is still fresh; otherwise the cached overview
+        is returned immediately and ``refresh`` is a task resolving to a newly
+        fetched one.
+        """
+        return await self.overview_cache.get_stale_while_revalidate(
+            collection_slug,
+            OVERVIEW_FRESH_TTL,
+            lambda: self.get_collection_overview(collection_slug),
+            cacheable=lambda overview: bool(overview[0]) and "error" not in overview[0],
+        )
 
-            stats, info, sales = await asyncio.gather(stats_task, info_task, sales_task)
-            return stats, info, sales
-    
     @staticmethod
     def _offer_item_quantity(offer: Dict[str, Any], fallback: int = 1) -> int:
         """How many NFTs the offer is priced for, from the Seaport consideration.
@@ -126,8 +211,7 @@ class OpenSeaAPI:
         safe_slug = quote(collection_slug, safe="")
         url = f"{self.base_url}/offers/collection/{safe_slug}"
 
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            data = await self._make_request(url, session)
+        data = await self._make_request(url)
 
         if not data:
             return {"error": "Gagal mengambil data offer"}
@@ -177,16 +261,12 @@ class OpenSeaAPI:
         Get stats and info in parallel for faster response
         Returns (stats, info) tuple
         """
-        stats_url = f"{self.base_url}/collections/{collection_slug}/stats"
-        info_url = f"{self.base_url}/collections/{collection_slug}"
-        
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            # Run both requests in parallel
-            stats_task = self._make_request(stats_url, session)
-            info_task = self._make_request(info_url, session)
-            
-            stats, info = await asyncio.gather(stats_task, info_task)
-            return stats, info
+        # Info is normally a metadata cache hit, so only stats cost a request
+        stats, info = await asyncio.gather(
+            self.get_collection_stats(collection_slug),
+            self.get_collection_info(collection_slug),
+        )
+        return stats, info
 
     def _escape_md(self, value: Any) -> str:
         """Escape Telegram legacy Markdown control characters in dynamic text."""
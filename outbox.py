@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from config import (
+    OUTBOX_MAX_IN_FLIGHT,
+    OUTBOX_RETENTION_DAYS,
+    DIGEST_MAX_CHARS,
+    DIGEST_MAX_ITEMS,
+)
+from database import async_db
+from notifier import notifier
+
+logger = logging.getLogger(__name__)
+
+# How often finished rows older than the retention window are deleted.
+_PURGE_INTERVAL = 3600  # seconds
+
+_DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+
+def build_digests(rows: List[Tuple[int, int, str]], max_chars: int,
+                  max_items: int) -> List[Tuple[int, List[int], str]]:
+    """Merge outbox rows (id, user_id, message) into per-user digests.
+
+    Returns (user_id, outbox ids, text) per message to send, in order of each
+    user's oldest row. A user's messages are packed into as few digests as
+    ``max_chars`` / ``max_items`` allow; a single row is sent unchanged.
+    """
+    by_user: Dict[int, List[Tuple[int, str]]] = {}
+    for outbox_id, user_id, message in rows:
+        by_user.setdefault(user_id, []).append((outbox_id, message))
+
+    # Leave room for the header, e.g. "🔔 *15 alert baru* (2/3)\n\n".
+    budget = max_chars - 40
+    digests = []
+    for user_id, items in by_user.items():
+        parts: List[List[Tuple[int, str]]] = [[]]
+        size = 0
+        for outbox_id, message in items:
+            extra = len(message) + (len(_DIGEST_SEPARATOR) if parts[-1] else 0)
+            if parts[-1] and (size + extra > budget or len(parts[-1]) >= max_items):
+                parts.append([])
+                size, extra = 0, len(message)
+            parts[-1].append((outbox_id, message))
+            size += extra
+
+        for number, part in enumerate(parts, 1):
+            ids = [outbox_id for outbox_id, _message in part]
+            if len(part) == 1 and len(parts) == 1:
+                digests.append((user_id, ids, part[0][1]))
+                continue
+            header = f"🔔 *{len(part)} alert baru*"
+            if len(parts) > 1:
+                header += f" ({number}/{len(parts)})"
+            text = header + "\n\n" + _DIGEST_SEPARATOR.join(message for _id, message in part)
+            digests.append((user_id, ids, text))
+    return digests
+
+
+class NotificationOutbox:
+    """Hands pending ``notification_outbox`` rows to the notifier and records the outcome.
+
+    Rows are written by the alert checks in the same transaction as the alert
+    state change, so a crash can no longer lose or double-fire an alert: on
+    restart every row still marked pending is sent. Rows are claimed in id
+    order behind a high-water mark, each id is queued at most once per
+    process, and results are written back in batches on the next drain.
+
+    Rows claimed together are merged per user into digests, and an alert
+    cycle holds draining back (``cycle()``) until all of its evaluators have
+    written, so one market-wide move costs each user one message.
+    """
+
+    def __init__(self, max_in_flight: int, retention_days: int,
+                 digest_max_chars: int, digest_max_items: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.retention_days = retention_days
+        self.digest_max_chars = digest_max_chars
+        self.digest_max_items = max(1, digest_max_items)
+        self._high_water = 0  # largest outbox id handed to the notifier
+        self._in_flight: set = set()
+        self._sent: List[int] = []
+        self._failed: List[int] = []
+        self._lock = asyncio.Lock()
+        self._next_purge = 0.0
+        self._stats = {"claimed": 0, "messages": 0, "sent": 0, "failed": 0, "purged": 0}
+
+    def _on_result(self, outbox_ids: List[int], delivered: bool):
+        (self._sent if delivered else self._failed).extend(outbox_ids)
+
+    @contextlib.asynccontextmanager
+    async def cycle(self):
+        """Hold back draining while an alert cycle writes, then drain everything it queued.
+
+        Writing only inside a cycle also keeps ids committed in order behind
+        the high-water mark.
+        """
+        async with self._lock:
+            yield
+        try:
+            await self.drain()
+        except Exception as e:
+            logger.error(f"Error draining notification outbox: {e}")
+
+    async def flush(self):
+        """Write delivery results collected since the last flush."""
+        sent, self._sent = self._sent, []
+        failed, self._failed = self._failed, []
+        if not sent and not failed:
+            return
+        try:
+            await async_db.finish_notifications(sent, failed)
+        except Exception as e:
+            logger.error(f"Failed to record {len(sent) + len(failed)} outbox results: {e}")
+            self._sent[:0], self._failed[:0] = sent, failed
+            return
+        self._in_flight.difference_update(sent)
+        self._in_flight.difference_update(failed)
+        self._stats["sent"] += len(sent)
+        self._stats["failed"] += len(failed)
+
+    async def drain(self, wait: bool = True) -> int:
+        """Record finished deliveries and queue newly pending rows; returns rows queued.
+
+        With ``wait=False`` the call returns at once if a drain or cycle is running.
+        """
+        if not wait and self._lock.locked():
+            return 0
+        async with self._lock:
+            await self.flush()
+            await self._purge_if_due()
+
+            room = self.max_in_flight - len(self._in_flight)
+            if room <= 0:
+                return 0
+            rows = await async_db.get_pending_notifications(self._high_water, room)
+            if not rows:
+                return 0
+            self._high_water = max(self._high_water, rows[-1][0])
+            digests = build_digests(rows, self.digest_max_chars, self.digest_max_items)
+            for user_id, outbox_ids, text in digests:
+                self._in_flight.update(outbox_ids)
+                notifier.enqueue(
+                    user_id,
+                    text,
+                    dedupe_key=("outbox", outbox_ids[0]),
+                    on_result=functools.partial(self._on_result, outbox_ids),
+                )
+            self._stats["claimed"] += len(rows)
+            self._stats["messages"] += len(digests)
+            return len(rows)
+
+    async def _purge_if_due(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + _PURGE_INTERVAL
+        try:
+            self._stats["purged"] += await async_db.purge_notifications(self.retention_days)
+        except Exception as e:
+            logger.error(f"Failed to purge notification outbox: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "in_flight": len(self._in_flight),
+            "unrecorded_results": len(self._sent) + len(self._failed),
+        }
+
+
+# Singleton instance, drained by a repeating job and after every alert check
+outbox = NotificationOutbox(
+    max_in_flight=OUTBOX_MAX_IN_FLIGHT,
+    retention_days=OUTBOX_RETENTION_DAYS,
+    digest_max_chars=DIGEST_MAX_CHARS,
+    digest_max_items=DIGEST_MAX_ITEMS,
+)
@@ -1,7 +1,8 @@
 import aiohttp
-import asyncio
 import time
 from typing import Optional, Dict, Any
+from http_client import HttpClient
+from rate_limiter import get_bucket
 
 
 class PriceAPI:
@@ -9,7 +10,19 @@ class PriceAPI:
 
     def __init__(self):
         self.base_url = "https://api.coingecko.com/api/v3"
-        self.timeout = aiohttp.ClientTimeout(total=10, connect=5)
+        self.http = HttpClient(
+            "coingecko",
+            "CoinGecko",
+            timeout=aiohttp.ClientTimeout(total=10, connect=5),
+            pool_limit=10,
+            pool_limit_per_host=4,
+            # CoinGecko free tier allows roughly 10-30 calls/minute.
+            limiter=get_bucket(
+                "coingecko", "coingecko",
+                rate=0.25, burst=5, min_rate=0.1, max_rate=0.5,
+            ),
+            status_errors={429: "Rate limit exceeded. Coba lagi dalam 1 menit."},
+        )
         # Cache to avoid rate limiting (CoinGecko free tier: 10-30 req/min)
         self._cache: Dict[str, Any] = {}
         self._cache_ttl = 60  # Cache for 60 seconds
@@ -45,32 +58,21 @@ class PriceAPI:
             f"&include_market_cap=true"
         )
 
-        try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        eth_data = data.get("ethereum", {})
-                        result = {
-                            "usd": eth_data.get("usd", 0),
-                            "idr": eth_data.get("idr", 0),
-                            "usd_24h_change": eth_data.get("usd_24h_change", 0),
-                            "idr_24h_change": eth_data.get("idr_24h_change", 0),
-                            "usd_24h_vol": eth_data.get("usd_24h_vol", 0),
-                            "usd_market_cap": eth_data.get("usd_market_cap", 0),
-                        }
-                        self._set_cache(cache_key, result)
-                        return result
-                    elif response.status == 429:
-                        return {"error": "Rate limit exceeded. Coba lagi dalam 1 menit."}
-                    else:
-                        return {"error": f"API error: {response.status}"}
-        except asyncio.TimeoutError:
-            return {"error": "Request timeout - CoinGecko API lambat, coba lagi"}
-        except aiohttp.ClientError as e:
-            return {"error": f"Connection error: {str(e)}"}
-        except Exception as e:
-            return {"error": f"Error: {str(e)}"}
+        data = await self.http.get_json(url)
+        if "error" in data:
+            return data
+
+        eth_data = data.get("ethereum", {})
+        result = {
+            "usd": eth_data.get("usd", 0),
+            "idr": eth_data.get("idr", 0),
+            "usd_24h_change": eth_data.get("usd_24h_change", 0),
+            "idr_24h_change": eth_data.get("idr_24h_change", 0),
+            "usd_24h_vol": eth_data.get("usd_24h_vol", 0),
+            "usd_market_cap": eth_data.get("usd_market_cap", 0),
+        }
+        self._set_cache(cache_key, result)
+        return result
 
     def format_eth_price(self, price_data: Dict[str, Any]) -> str:
         """Format ETH price data into a readable message."""
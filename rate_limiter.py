@@ -0,0 +1,233 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Optional, Dict, Any
+
+
+class Priority(IntEnum):
+    """Upstream request classes, most latency-sensitive first."""
+    INTERACTIVE = 0  # user commands and buttons
+    ALERT = 1        # background alert evaluation
+    HISTORY = 2      # hourly price history recording
+
+
+# Share of grants each class receives while several are backlogged. Weighted
+# fair queuing keeps interactive latency low without starving background jobs.
+PRIORITY_WEIGHTS = {
+    Priority.INTERACTIVE: 8.0,
+    Priority.ALERT: 3.0,
+    Priority.HISTORY: 1.0,
+}
+
+_current_priority: ContextVar[Priority] = ContextVar("upstream_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: Priority):
+    """Tag every upstream request made inside this block (and tasks it spawns)."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Process-wide token bucket that paces every request to one upstream key.
+
+    The refill rate adapts AIMD-style: a 429 halves it (down to ``min_rate``)
+    and blocks all callers until ``Retry-After`` has passed; after a quiet
+    period without 429s it creeps back up by ``increase_step`` towards
+    ``max_rate``, so the bot settles near the API's real ceiling.
+
+    Waiters queue per ``Priority`` class and tokens are handed out by weighted
+    fair queuing (FIFO within a class), so a user tapping /check during an
+    alert sweep jumps ahead of hundreds of queued background requests.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int,
+                 min_rate: float, max_rate: float,
+                 increase_step: float = 0.25,
+                 increase_interval: float = 5.0,
+                 quiet_period: float = 30.0,
+                 decrease_factor: float = 0.5,
+                 default_penalty: float = 2.0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.increase_step = increase_step
+        self.increase_interval = increase_interval
+        self.quiet_period = quiet_period
+        self.decrease_factor = decrease_factor
+        self.default_penalty = default_penalty
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_limited = 0.0
+        self._last_increase = 0.0
+
+        self._queues = {priority: deque() for priority in Priority}
+        self._finish = {priority: 0.0 for priority in Priority}  # WFQ virtual time
+        self._virtual_time = 0.0
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stats = {"acquired": 0, "rate_limited": 0, "wait_seconds": 0.0}
+        self._class_stats = {
+            priority: {"acquired": 0, "wait_seconds": 0.0} for priority in Priority
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        if now >= self._blocked_until and self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _next_class(self) -> Optional[Priority]:
+        """Backlogged class with the smallest virtual finish time."""
+        ready = [priority for priority, queue in self._queues.items() if queue]
+        if not ready:
+            return None
+        return min(ready, key=lambda priority: (self._finish[priority], priority))
+
+    async def _dispatch(self):
+        """Grant tokens to queued waiters until every queue is drained."""
+        while True:
+            priority = self._next_class()
+            if priority is None:
+                return
+            queue = self._queues[priority]
+            if queue[0].done():  # cancelled while waiting
+                queue.popleft()
+                continue
+            if not self._take_token():
+                now = time.monotonic()
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+                continue
+            queue.popleft().set_result(None)
+            self._virtual_time = self._finish[priority]
+            self._finish[priority] += 1.0 / PRIORITY_WEIGHTS[priority]
+
+    async def acquire(self, priority: Optional[Priority] = None):
+        """Wait until a request of ``priority`` (default: the caller's context) may be sent."""
+        if priority is None:
+            priority = current_priority()
+        started = time.monotonic()
+
+        idle = not any(self._queues.values())
+        if not (idle and self._take_token()):
+            queue = self._queues[priority]
+            if not queue:
+                # A class that was idle starts at the current virtual time
+                # instead of cashing in credit for the time it sent nothing.
+                self._finish[priority] = max(self._finish[priority], self._virtual_time)
+            waiter = asyncio.get_running_loop().create_future()
+            queue.append(waiter)
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            await waiter
+
+        waited = time.monotonic() - started
+        self._stats["acquired"] += 1
+        self._stats["wait_seconds"] += waited
+        self._class_stats[priority]["acquired"] += 1
+        self._class_stats[priority]["wait_seconds"] += waited
+
+    def on_success(self):
+        """Raise the rate again once 429s have stopped for a while."""
+        now = time.monotonic()
+        if (self.rate < self.max_rate
+                and now - self._last_limited >= self.quiet_period
+                and now - self._last_increase >= self.increase_interval):
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+            self._last_increase = now
+
+    def blocked_for(self) -> float:
+        """Seconds left of the current Retry-After pause (0 when not paused)."""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Back off after a 429: cut the rate and pause until Retry-After."""
+        now = time.monotonic()
+        self._stats["rate_limited"] += 1
+        # Several in-flight requests often get 429 together; only cut once per burst.
+        if now - self._last_limited >= 1.0:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._last_limited = now
+        pause = retry_after if retry_after is not None else self.default_penalty
+        self._blocked_until = max(self._blocked_until, now + pause)
+        self._tokens = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": round(self.rate, 3),
+            "tokens": round(self._tokens, 2),
+            "blocked_for": round(self.blocked_for(), 2),
+            "acquired": self._stats["acquired"],
+            "rate_limited": self._stats["rate_limited"],
+            "wait_seconds": round(self._stats["wait_seconds"], 2),
+            "classes": {
+                priority.name.lower(): {
+                    "queued": len(self._queues[priority]),
+                    "acquired": self._class_stats[priority]["acquired"],
+                    "wait_seconds": round(self._class_stats[priority]["wait_seconds"], 2),
+                }
+                for priority in Priority
+            },
+        }
+
+
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def get_bucket(key: str, name: str, **settings) -> TokenBucket:
+    """Return the shared bucket for ``key`` (e.g. an API key), creating it once.
+
+    ``name`` is what /metrics shows, so secrets used as keys never leak there.
+    """
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = TokenBucket(name, **settings)
+        _buckets[key] = bucket
+    return bucket
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    return {bucket.name: bucket.stats() for bucket in _buckets.values()}